@@ -0,0 +1 @@
+python3 "processing/build.py" "build.json" --verbose
\ No newline at end of file
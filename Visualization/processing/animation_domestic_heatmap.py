@@ -1,84 +1,113 @@
+import argparse
 import util
-import numpy as np
+import heatmap
 import datetime
 import matplotlib.pyplot as plt
 import matplotlib.animation as animation
 
 if __name__ == "__main__":
-    combined = util.load_cdf("Visualization/domestic.nc")
+    parser = argparse.ArgumentParser(
+        description="Animate the domestic traffic heatmap for every month"
+    )
+    parser.add_argument(
+        "--output",
+        default="Visualization/graphs/domestic_heatmap.mp4",
+        help="Output video file. Defaults to 'Visualization/graphs/domestic_heatmap.mp4'",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        help="Number of worker processes used to draw frames. Defaults to the number of CPUs",
+    )
+    parser.add_argument(
+        "--fps", type=int, default=12, help="Frames per second. Defaults to 12"
+    )
+    parser.add_argument(
+        "--dpi", type=int, default=100, help="Resolution of each frame. Defaults to 100"
+    )
+    parser.add_argument(
+        "--preview",
+        action="store_true",
+        help="Show the animation in a window instead of rendering it",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Read one month at a time to keep memory constant",
+    )
+    parser.add_argument(
+        "--start",
+        type=int,
+        default=2004,
+        help="First year to animate. Defaults to 2004",
+    )
+    parser.add_argument(
+        "--end", type=int, default=2019, help="Last year to animate. Defaults to 2019"
+    )
+    parser.add_argument(
+        "--verbose", action="store_true", help="Enable additional output logging"
+    )
+    args = parser.parse_args()
 
-    origin_airports = combined.coords["Origin"].values
-    destination_airports = combined.coords["Destination"].values
-    years = [x for x in range(2004, 2020)]
+    years = [x for x in range(args.start, args.end + 1)]
     months = [
         datetime.datetime(year, month, 1) for year in years for month in range(1, 13)
     ]
 
-    # Setup a nicer datastructure to work with
-    # This time around we want one for every month
-    all_airports = list(set(origin_airports) | set(destination_airports))
-    all_airports = sorted(all_airports)
-    airport_indexes = {value: i for i, value in enumerate(all_airports)}
-    heatmap_data = [
-        np.zeros(shape=(len(all_airports), len(all_airports)))
-        for x in range(len(months))
-    ]
-
-    # Process all the data in advance
-    # This may take a while
-    # Efficiency is for nerds
-    for i, month in enumerate(months):
-        data = combined.sel(Month=month)
-
-        for origin in origin_airports:
-            origin_index = airport_indexes[origin]
-            city_data = data.sel(Origin=origin).dropna(dim="Destination", how="all")
-
-            for row in city_data.Passengers:
-                count = int(row.values)
-
-                destination_index = airport_indexes[
-                    str(row.coords["Destination"].values)
-                ]
-
-                # Set both sides of the array to this value
-                heatmap_data[i][origin_index, destination_index] = count
-                heatmap_data[i][destination_index, origin_index] = count
-
-    # Setup the axis
-    fig, ax = plt.subplots()
-    fig.set_size_inches(16, 9)
-    img = ax.imshow(heatmap_data[0], cmap="plasma")
-
-    ax.set_xticks(np.arange(len(all_airports)))
-    ax.set_yticks(np.arange(len(all_airports)))
-    ax.set_xticklabels(all_airports)
-    ax.set_yticklabels(all_airports)
-    plt.setp(ax.get_xticklabels(), rotation=45, ha="right", rotation_mode="anchor")
-
-    # Adjust colorbar
-    cbar = ax.figure.colorbar(img, ax=ax)
-    cbar.ax.set_ylabel("Total Traffic")
-
-    # Prepare the animation
-    def animate(data):
-        (i, month) = data
-        dataset = heatmap_data[i]
-
-        ax.set_title(month.strftime("%m-%Y"))
-        img.set_data(dataset)
-
-    anim = animation.FuncAnimation(
-        fig,
-        animate,
-        interval=1000 / 12,
-        repeat=True,
-        frames=[(i, month) for i, month in enumerate(months)],
-    )
-
-    # Save the animation
-    anim.save(
-        "Visualization/graphs/domestic_heatmap.mp4", writer="imagemagick", dpi=100
-    )
-
-    plt.show()
+    if args.stream:
+        # Only one month of the cube is read at a time
+        combined = util.load_cdf("Visualization/domestic.nc", chunks={"Month": 1})
+        all_airports = heatmap.all_airports(combined)
+        vmin, vmax = heatmap.od_range(combined, months, airports=all_airports)
+    else:
+        # Process all the data in advance
+        # One symmetric matrix for every month, with a shared colour scale
+        combined = util.load_cdf("Visualization/domestic.nc")
+        heatmap_data, all_airports, vmin, vmax = heatmap.od_tensor(
+            combined, months=months
+        )
+
+    def frames():
+        if args.stream:
+            yield from heatmap.od_frames(combined, months, airports=all_airports)
+        else:
+            for i, month in enumerate(months):
+                yield (i, month, heatmap_data[i])
+
+    if not args.preview:
+        # Draw the frames in parallel and stream them to ffmpeg
+        heatmap.render_animation(
+            frames(),
+            all_airports,
+            vmin,
+            vmax,
+            args.output,
+            count=len(months),
+            fps=args.fps,
+            dpi=args.dpi,
+            jobs=args.jobs,
+            verbose=args.verbose,
+        )
+    else:
+        # Setup the axis
+        fig, ax, img = heatmap.setup_figure(all_airports, vmin, vmax)
+
+        # Prepare the animation
+        def animate(data):
+            i, month, dataset = data
+
+            ax.set_title(month.strftime("%m-%Y"))
+            img.set_data(dataset)
+
+        # Frames aren't cached, so streamed months are dropped once drawn
+        anim = animation.FuncAnimation(
+            fig,
+            animate,
+            interval=1000 / args.fps,
+            repeat=True,
+            frames=frames,
+            save_count=len(months),
+            cache_frame_data=False,
+        )
+
+        plt.show()
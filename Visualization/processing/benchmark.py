@@ -0,0 +1,348 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import util
+
+# Column layouts of the published spreadsheets
+CITYPAIRS_COLUMNS = [
+    "Month",
+    "AustralianPort",
+    "ForeignPort",
+    "Country",
+    "Service_Region",
+    "PaxIn",
+    "PaxOut",
+    "FreightIn_(tonnes)",
+    "FreightOut_(tonnes)",
+    "MailIn_(tonnes)",
+    "MailOut_(tonnes)",
+    "Year",
+    "Month_num",
+]
+
+TOPROUTES_COLUMNS = [
+    "Year",
+    "Month",
+    "Origin",
+    "Destination",
+    "Passengers",
+    "Trips",
+    "RPKs",
+    "ASKs",
+    "Seats",
+    "Load_Factor",
+]
+
+AUSTRALIAN_PORTS = [
+    "Sydney",
+    "Melbourne",
+    "Brisbane",
+    "Perth",
+    "Gold Coast",
+    "Adelaide",
+    "Darwin",
+    "Cairns",
+    "Hobart",
+    "Canberra",
+]
+
+DOMESTIC_AIRPORTS = [
+    "SYD",
+    "MEL",
+    "BNE",
+    "PER",
+    "ADL",
+    "DRW",
+    "OOL",
+    "CNS",
+    "HBA",
+    "CBR",
+    "TSV",
+    "LST",
+]
+
+FOREIGN_PORT_COUNT = 60
+
+DATASETS = {
+    "international": {
+        "columns": util.DEFAULT_COLUMNS,
+        "index": util.DEFAULT_INDEX,
+        "sheet": "Data",
+        "mergedate": False,
+    },
+    "domestic": {
+        "columns": ["Year", "Month", "Origin", "Destination", "Passengers", "Trips"],
+        "index": ["Origin", "Destination", "Month"],
+        "sheet": "Top Routes",
+        "mergedate": True,
+    },
+}
+
+
+def generate_citypairs(
+    path: str, rows: int, start: str = "1985-01-01", seed: int = 0
+) -> int:
+    """Write a synthetic CityPairs spreadsheet
+    Every row is a distinct port pair and month, and some counts use the '..' placeholder
+
+    Arguments:
+        path {str} -- Output spreadsheet file
+        rows {int} -- Number of rows to generate
+
+    Keyword Arguments:
+        start {str} -- First month in the spreadsheet (default: {"1985-01-01"})
+        seed {int} -- Random seed (default: {0})
+
+    Returns:
+        int -- Number of months covered by the spreadsheet
+    """
+    rng = np.random.default_rng(seed)
+    foreign_ports = [f"Foreign Port {i:03d}" for i in range(FOREIGN_PORT_COUNT)]
+
+    # Walk through every month, then every Australian port, then every foreign port
+    i = np.arange(rows)
+    per_month = len(AUSTRALIAN_PORTS) * len(foreign_ports)
+    months = pd.date_range(start, periods=i[-1] // per_month + 1, freq="MS")
+    month = months[i // per_month]
+    foreign = np.array(foreign_ports)[i % len(foreign_ports)]
+
+    df = pd.DataFrame(
+        {
+            "Month": month,
+            "AustralianPort": np.array(AUSTRALIAN_PORTS)[
+                (i // len(foreign_ports)) % len(AUSTRALIAN_PORTS)
+            ],
+            "ForeignPort": foreign,
+            "Country": np.char.replace(foreign, "Port", "Country"),
+            "Service_Region": "Region",
+            "PaxIn": rng.integers(0, 50000, rows).astype(object),
+            "PaxOut": rng.integers(0, 50000, rows).astype(object),
+            "FreightIn_(tonnes)": rng.random(rows) * 100,
+            "FreightOut_(tonnes)": rng.random(rows) * 100,
+            "MailIn_(tonnes)": rng.random(rows),
+            "MailOut_(tonnes)": rng.random(rows),
+            "Year": month.year,
+            "Month_num": month.month,
+        },
+        columns=CITYPAIRS_COLUMNS,
+    )
+
+    # Small counts are suppressed in the published data
+    df.loc[rng.random(rows) < 0.05, "PaxIn"] = ".."
+    df.loc[rng.random(rows) < 0.05, "PaxOut"] = ".."
+
+    df.to_excel(path, sheet_name="Data", index=False)
+    return len(months)
+
+
+def generate_toproutes(
+    path: str, rows: int, start: str = "1985-01-01", seed: int = 0
+) -> int:
+    """Write a synthetic TopRoutes spreadsheet
+    Every row is a distinct airport pair and month, and some rows are not available for release
+
+    Arguments:
+        path {str} -- Output spreadsheet file
+        rows {int} -- Number of rows to generate
+
+    Keyword Arguments:
+        start {str} -- First month in the spreadsheet (default: {"1985-01-01"})
+        seed {int} -- Random seed (default: {0})
+
+    Returns:
+        int -- Number of months covered by the spreadsheet
+    """
+    rng = np.random.default_rng(seed)
+    airports = np.array(DOMESTIC_AIRPORTS)
+
+    # Walk through every month, then every origin, then every destination
+    i = np.arange(rows)
+    per_month = len(airports) ** 2
+    months = pd.date_range(start, periods=i[-1] // per_month + 1, freq="MS")
+    month = months[i // per_month]
+
+    passengers = rng.integers(1000, 1000000, rows).astype(object)
+    passengers[rng.random(rows) < 0.05] = "Data not available for release."
+
+    df = pd.DataFrame(
+        {
+            "Year": month.year,
+            "Month": month.month,
+            "Origin": airports[(i // len(airports)) % len(airports)],
+            "Destination": airports[i % len(airports)],
+            "Passengers": passengers,
+            "Trips": rng.integers(10, 5000, rows),
+            "RPKs": rng.random(rows) * 1e6,
+            "ASKs": rng.random(rows) * 1e6,
+            "Seats": rng.integers(1000, 1000000, rows),
+            "Load_Factor": rng.random(rows) * 100,
+        },
+        columns=TOPROUTES_COLUMNS,
+    )
+
+    df.to_excel(path, sheet_name="Top Routes", index=False)
+    return len(months)
+
+
+def generate_workbooks(
+    directory: str, dataset: str, rows: int, files: int = 1, seed: int = 0
+) -> list:
+    """Write a set of synthetic spreadsheets covering consecutive months
+
+    Arguments:
+        directory {str} -- Directory to write the spreadsheets to
+        dataset {str} -- Either "international" or "domestic"
+        rows {int} -- Number of rows in each spreadsheet
+
+    Keyword Arguments:
+        files {int} -- Number of spreadsheets to generate (default: {1})
+        seed {int} -- Random seed (default: {0})
+
+    Returns:
+        list -- Filenames of the generated spreadsheets
+    """
+    generate = generate_citypairs if dataset == "international" else generate_toproutes
+    prefix = "CityPairs" if dataset == "international" else "TopRoutes"
+
+    filenames = []
+    start = pd.Timestamp("1985-01-01")
+    for i in range(files):
+        path = os.path.join(directory, f"{prefix}_{i}.xlsx")
+        months = generate(path, rows, start=str(start.date()), seed=seed + i)
+        start += pd.DateOffset(months=months)
+        filenames.append(path)
+    return filenames
+
+
+def run_stage(report: list, name: str, rows: int, func, *args, **kwargs):
+    """Run and time a single stage, adding the result to the report
+    Memory isn't traced, as that would skew the timings, so peak_rss is None where it can't be read cheaply
+
+    Arguments:
+        report {list} -- List of stage results to add to
+        name {str} -- Name of the stage
+        rows {int} -- Number of rows handled by the stage, or None to count the rows in the result
+        func {callable} -- Stage to run
+
+    Returns:
+        Any -- Result of the stage
+    """
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    if rows is None:
+        rows = len(result.index)
+
+    report.append(
+        {
+            "stage": name,
+            "seconds": elapsed,
+            "rows": rows,
+            "rows_per_second": rows / elapsed if elapsed else None,
+            "peak_rss": util.peak_rss(),
+        }
+    )
+    return result
+
+
+def benchmark(files: list, dataset: str, output: str) -> dict:
+    """Time each stage of excel_to_cdf on a set of spreadsheets
+
+    Arguments:
+        files {list} -- Spreadsheets to process
+        dataset {str} -- Either "international" or "domestic"
+        output {str} -- Temporary cdf file to write
+
+    Returns:
+        dict -- Report with one entry per stage
+    """
+    settings = DATASETS[dataset]
+    stages = []
+
+    data = []
+    for file in files:
+        df = run_stage(
+            stages, "read", None, pd.read_excel, file, sheet_name=settings["sheet"]
+        )
+        stages[-1]["file"] = os.path.basename(file)
+
+        df = run_stage(
+            stages,
+            "sanitise",
+            len(df.index),
+            util.sanitise_frame,
+            df,
+            settings["columns"],
+            settings["mergedate"],
+        )
+        stages[-1]["file"] = os.path.basename(file)
+        data.append(df)
+
+    rows = sum(len(df.index) for df in data)
+    combined = run_stage(stages, "concat", rows, pd.concat, data)
+    combined = run_stage(
+        stages, "set_index", rows, combined.set_index, settings["index"]
+    )
+    combined = run_stage(stages, "to_xarray", rows, combined.to_xarray)
+    run_stage(stages, "to_netcdf", rows, combined.to_netcdf, output, engine="h5netcdf")
+
+    return {
+        "dataset": dataset,
+        "files": [os.path.basename(file) for file in files],
+        "rows": rows,
+        "output_bytes": os.path.getsize(output),
+        "seconds": sum(stage["seconds"] for stage in stages),
+        "peak_rss": util.peak_rss(),
+        "stages": stages,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark excel_to_cdf on synthetic CityPairs and TopRoutes spreadsheets"
+    )
+    parser.add_argument(
+        "--dataset",
+        choices=list(DATASETS),
+        default="international",
+        help="Spreadsheet layout to generate. Defaults to 'international'",
+    )
+    parser.add_argument(
+        "--rows",
+        type=int,
+        default=100000,
+        help="Number of rows in each spreadsheet. Defaults to 100000",
+    )
+    parser.add_argument(
+        "--files", type=int, default=2, help="Number of spreadsheets. Defaults to 2"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument(
+        "--workdir",
+        help="Directory for the generated spreadsheets. Defaults to a temporary directory",
+    )
+    parser.add_argument(
+        "--output", help="Output JSON report. Leave blank to print the report."
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp:
+        workdir = args.workdir if args.workdir else temp
+        os.makedirs(workdir, exist_ok=True)
+
+        files = generate_workbooks(
+            workdir, args.dataset, args.rows, files=args.files, seed=args.seed
+        )
+        report = benchmark(files, args.dataset, os.path.join(workdir, "benchmark.nc"))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
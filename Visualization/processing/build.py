@@ -0,0 +1,115 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import util
+
+# Dataset settings that hold paths, and are relative to the config file
+PATH_SETTINGS = ["output", "profile", "quarantine", "cache_dir"]
+
+
+def load_config(filename: str) -> dict:
+    """Load a build config file
+    Paths in the config are resolved relative to the config file
+
+    Arguments:
+        filename {str} -- JSON config file describing each dataset
+
+    Returns:
+        dict -- Build config with absolute paths
+    """
+    with open(filename) as f:
+        config = json.load(f)
+
+    root = os.path.dirname(os.path.abspath(filename))
+    for dataset in config["datasets"]:
+        if "name" not in dataset:
+            raise ValueError(f"Every dataset in {filename} needs a name")
+        if "jobs" in dataset or "pool" in dataset:
+            raise ValueError(
+                f"Dataset {dataset['name']} can't set its own workers, use the top level jobs setting"
+            )
+
+        dataset["files"] = [os.path.join(root, file) for file in dataset["files"]]
+        for setting in PATH_SETTINGS:
+            if dataset.get(setting):
+                dataset[setting] = os.path.join(root, dataset[setting])
+
+    return config
+
+
+def build_dataset(settings: dict, pool: ProcessPoolExecutor) -> float:
+    """Build a single dataset from the config
+
+    Arguments:
+        settings {dict} -- Dataset settings, passed through to excel_to_cdf
+        pool {ProcessPoolExecutor} -- Worker pool shared between every dataset
+
+    Returns:
+        float -- Time taken in seconds
+    """
+    start = time.perf_counter()
+    settings = {key: value for key, value in settings.items() if key != "name"}
+    util.excel_to_cdf(**settings, pool=pool)
+    return time.perf_counter() - start
+
+
+def build(config: dict, jobs: int = None, only: list = None, verbose: bool = False):
+    """Build every dataset in a config in a single process
+    Every spreadsheet of every dataset is parsed in one shared worker pool
+
+    Arguments:
+        config {dict} -- Build config from load_config
+
+    Keyword Arguments:
+        jobs {int} -- Number of worker processes, overrides the config (default: {None})
+        only {list} -- Only build the datasets with these names (default: {None})
+        verbose {bool} -- Enable additional output logging (default: {False})
+
+    Returns:
+        dict -- Time taken in seconds for each dataset
+    """
+    datasets = [
+        dataset for dataset in config["datasets"] if not only or dataset["name"] in only
+    ]
+    jobs = jobs if jobs else config.get("jobs", os.cpu_count())
+
+    # Each dataset is assembled in its own thread, while the parsing happens in the shared pool
+    timings = {}
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        with ThreadPoolExecutor(max_workers=max(len(datasets), 1)) as threads:
+            futures = {
+                dataset["name"]: threads.submit(
+                    build_dataset, {"verbose": verbose, **dataset}, pool
+                )
+                for dataset in datasets
+            }
+            for name, future in futures.items():
+                timings[name] = future.result()
+                if verbose:
+                    print(f"Built {name} in {timings[name]:.2f}s")
+
+    return timings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Build every dataset described in a config file"
+    )
+    parser.add_argument("config", help="JSON config file describing each dataset")
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        help="Number of worker processes. Defaults to the config, or the number of CPUs",
+    )
+    parser.add_argument("--only", nargs="*", help="Only build these datasets")
+    parser.add_argument(
+        "--verbose", action="store_true", help="Enable additional output logging"
+    )
+    args = parser.parse_args()
+
+    build(
+        load_config(args.config), jobs=args.jobs, only=args.only, verbose=args.verbose
+    )
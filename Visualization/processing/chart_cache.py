@@ -0,0 +1,338 @@
+import functools
+import hashlib
+import inspect
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+import query
+
+DEFAULT_CACHE_DIR = ".chart_cache"
+MANIFEST = "manifest.json"
+
+# Bump this when the layout of the cached aggregates changes
+CACHE_VERSION = 1
+
+# Number of bytes read at a time when hashing a dataset
+HASH_BLOCK_SIZE = 1 << 20
+
+
+@functools.lru_cache(maxsize=None)
+def cached_content_key(key: tuple) -> str:
+    """Memoised version of content_key, keyed by the dataset fingerprint"""
+    path = key[0]
+    if os.path.isdir(path):
+        # Zarr stores are directories, so hash every file in a fixed order
+        files = sorted(
+            os.path.join(root, name)
+            for root, _, names in os.walk(path)
+            for name in names
+        )
+    else:
+        files = [path]
+
+    digest = hashlib.sha1()
+    for file in files:
+        digest.update(os.path.relpath(file, path).encode("utf-8"))
+        with open(file, "rb") as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def content_key(path: str) -> str:
+    """Get a key that only changes when the contents of a saved dataset change
+    Rebuilding a dataset from the same spreadsheets gives the same key
+    Each dataset is only read once while its size and modification time stay the same
+
+    Arguments:
+        path {str} -- Saved dataset
+
+    Returns:
+        str -- Hex digest of the dataset
+    """
+    return cached_content_key(query.fingerprint(path))
+
+
+def cache_key(paths: list, *parts) -> str:
+    """Get a key that changes whenever any of the inputs change
+
+    Arguments:
+        paths {list} -- Saved datasets the result is built from
+        *parts -- Any other JSON serialisable parameters, eg. chart settings
+
+    Returns:
+        str -- Hex digest of the inputs
+    """
+    key = [CACHE_VERSION, [content_key(path) for path in paths], list(parts)]
+    return hashlib.sha1(json.dumps(key, default=str).encode("utf-8")).hexdigest()
+
+
+def is_local(module) -> bool:
+    """Check if a module is one of the scripts in this directory
+
+    Arguments:
+        module {module} -- Module to check
+
+    Returns:
+        bool -- True if the module is in the same directory as this file
+    """
+    file = getattr(module, "__file__", None)
+    directory = os.path.dirname(os.path.abspath(__file__))
+    return bool(file) and os.path.dirname(os.path.abspath(file)) == directory
+
+
+def code_names(code) -> set:
+    """Get every global name used by a code object, including any nested functions
+
+    Arguments:
+        code {code} -- Compiled code of a function
+
+    Returns:
+        set -- Names
+    """
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if inspect.iscode(const):
+            names |= code_names(const)
+    return names
+
+
+def source_key(*funcs) -> str:
+    """Get a key that changes whenever the source of any function, or any local code it uses, changes
+    Local functions are followed through the global names they use
+    Local modules used as a whole, eg. query.port_table, are hashed in full along with their imports
+
+    Returns:
+        str -- Hex digest of the source code
+    """
+    sources = {}
+    pending = list(funcs)
+    while pending:
+        value = pending.pop()
+        if inspect.ismodule(value):
+            module = value
+        else:
+            module = sys.modules.get(getattr(value, "__module__", None))
+        if not is_local(module):
+            continue
+
+        # Scripts run directly are __main__, so name everything by file
+        name = os.path.basename(module.__file__)
+        if inspect.ismodule(value):
+            if name in sources:
+                continue
+            sources[name] = inspect.getsource(value)
+
+            # Follow the other modules and functions it imports
+            pending.extend(
+                item
+                for item in vars(value).values()
+                if inspect.ismodule(item)
+                or (inspect.isfunction(item) and item.__module__ != value.__name__)
+            )
+        else:
+            name = f"{name}:{value.__qualname__}"
+            if name in sources:
+                continue
+            sources[name] = inspect.getsource(value)
+
+            if inspect.isfunction(value):
+                pending.extend(
+                    value.__globals__[item]
+                    for item in code_names(value.__code__)
+                    if item in value.__globals__
+                )
+
+    digest = hashlib.sha1()
+    for name in sorted(sources):
+        digest.update(name.encode("utf-8"))
+        digest.update(sources[name].encode("utf-8"))
+    return digest.hexdigest()
+
+
+def pack(value, arrays: dict):
+    """Split a value into a JSON structure and a set of numpy arrays
+    Handles nested tuples, lists and dictionaries of arrays, series, dataframes and scalars
+
+    Arguments:
+        value {Any} -- Value to pack
+        arrays {dict} -- Arrays found so far, added to in place
+
+    Returns:
+        Any -- JSON serialisable structure referring to the arrays by name
+    """
+
+    def array(values) -> str:
+        name = f"a{len(arrays)}"
+        arrays[name] = np.asarray(values)
+        return name
+
+    if isinstance(value, pd.DataFrame):
+        return {
+            "type": "frame",
+            "index": pack(value.index, arrays),
+            "columns": list(value.columns),
+            "values": [array(value[column].values) for column in value.columns],
+        }
+    if isinstance(value, pd.Series):
+        return {
+            "type": "series",
+            "index": pack(value.index, arrays),
+            "name": value.name,
+            "values": array(value.values),
+        }
+    if isinstance(value, pd.Index):
+        return {"type": "index", "name": value.name, "values": array(value.values)}
+    if isinstance(value, np.ndarray):
+        return {"type": "array", "values": array(value)}
+    if isinstance(value, dict):
+        return {
+            "type": "dict",
+            "items": [[pack(k, arrays), pack(v, arrays)] for k, v in value.items()],
+        }
+    if isinstance(value, (tuple, list)):
+        return {
+            "type": type(value).__name__,
+            "items": [pack(item, arrays) for item in value],
+        }
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def unpack(value, arrays):
+    """Rebuild a value split apart by pack
+
+    Arguments:
+        value {Any} -- JSON structure from pack
+        arrays {dict} -- Arrays referred to by the structure
+
+    Returns:
+        Any -- Original value
+    """
+    if not isinstance(value, dict):
+        return value
+
+    kind = value["type"]
+    if kind == "frame":
+        index = unpack(value["index"], arrays)
+        data = {c: arrays[v] for c, v in zip(value["columns"], value["values"])}
+        return pd.DataFrame(data, index=index, columns=value["columns"])
+    if kind == "series":
+        index = unpack(value["index"], arrays)
+        return pd.Series(arrays[value["values"]], index=index, name=value["name"])
+    if kind == "index":
+        return pd.Index(arrays[value["values"]], name=value["name"])
+    if kind == "array":
+        return arrays[value["values"]]
+    if kind == "dict":
+        return {unpack(k, arrays): unpack(v, arrays) for k, v in value["items"]}
+    if kind == "tuple":
+        return tuple(unpack(item, arrays) for item in value["items"])
+    return [unpack(item, arrays) for item in value["items"]]
+
+
+def save_aggregate(value, filename: str):
+    """Save an aggregate to a .npz file
+
+    Arguments:
+        value {Any} -- Aggregate to save
+        filename {str} -- Output .npz file
+    """
+    arrays = {}
+    structure = pack(value, arrays)
+
+    # Write to a temporary file first so a crash never leaves a broken entry
+    temp = f"{filename}.tmp.npz"
+    np.savez(temp, __structure__=np.array(json.dumps(structure)), **arrays)
+    os.replace(temp, filename)
+
+
+def load_aggregate(filename: str):
+    """Load an aggregate saved by save_aggregate
+
+    Arguments:
+        filename {str} -- Saved .npz file
+
+    Returns:
+        Any -- Aggregate
+    """
+    with np.load(filename, allow_pickle=False) as f:
+        arrays = {name: f[name] for name in f.files}
+    structure = json.loads(str(arrays.pop("__structure__")))
+    return unpack(structure, arrays)
+
+
+def cached_aggregate(cache_dir: str, key: str, func, *args, **kwargs) -> tuple:
+    """Get an aggregate from the cache, or build and cache it
+
+    Arguments:
+        cache_dir {str} -- Cache directory, or None to disable the cache
+        key {str} -- Key from cache_key
+        func {callable} -- Function that builds the aggregate
+
+    Returns:
+        tuple -- Aggregate, and whether it came from the cache
+    """
+    if not cache_dir:
+        return func(*args, **kwargs), False
+
+    filename = os.path.join(cache_dir, f"{key}.npz")
+    if os.path.exists(filename):
+        return load_aggregate(filename), True
+
+    os.makedirs(cache_dir, exist_ok=True)
+    value = func(*args, **kwargs)
+    save_aggregate(value, filename)
+    return value, False
+
+
+def load_manifest(cache_dir: str) -> dict:
+    """Get the key each saved image was last rendered from
+
+    Arguments:
+        cache_dir {str} -- Cache directory
+
+    Returns:
+        dict -- Input key for each image file
+    """
+    filename = os.path.join(cache_dir, MANIFEST)
+    if not os.path.exists(filename):
+        return {}
+    with open(filename) as f:
+        return json.load(f)
+
+
+def save_manifest(cache_dir: str, manifest: dict):
+    """Save the key each image was last rendered from
+
+    Arguments:
+        cache_dir {str} -- Cache directory
+        manifest {dict} -- Input key for each image file
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    filename = os.path.join(cache_dir, MANIFEST)
+    with open(f"{filename}.tmp", "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(f"{filename}.tmp", filename)
+
+
+def is_stale(manifest: dict, image: str, key: str) -> bool:
+    """Check if an image needs to be rendered again
+    Images are stale if they are missing, or were rendered from different inputs
+
+    Arguments:
+        manifest {dict} -- Manifest from load_manifest
+        image {str} -- Image file
+        key {str} -- Key for the current inputs of the image
+
+    Returns:
+        bool -- True if the image should be rendered
+    """
+    if not os.path.exists(image):
+        return True
+    return manifest.get(os.path.abspath(image)) != key
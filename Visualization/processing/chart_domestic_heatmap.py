@@ -1,37 +1,22 @@
 import util
+import heatmap
 import numpy as np
 import datetime
 import matplotlib.pyplot as plt
 import calendar
 
-if __name__ == "__main__":
-    combined = util.load_cdf("Visualization/domestic.nc")
 
-    origin_airports = combined.coords["Origin"].values
-    destination_airports = combined.coords["Destination"].values
+def plot_heatmap(heatmap_data: np.ndarray, all_airports: list, title: str):
+    """Draw the traffic between every pair of airports as a heatmap
 
-    # Setup a nicer datastructure to work with
-    # Keep in mind we want this heatmap to work both ways
-    all_airports = list(set(origin_airports) | set(destination_airports))
-    all_airports = sorted(all_airports)
-    airport_indexes = {value: i for i, value in enumerate(all_airports)}
-    heatmap_data = np.zeros(shape=(len(all_airports), len(all_airports)))
-
-    # Get data for Dec-2019 by default
-    # We'll make this animated later
-    data = combined.sel(Month=datetime.datetime(2019, 12, 1))
-    for origin in origin_airports:
-        origin_index = airport_indexes[origin]
-        city_data = data.sel(Origin=origin).dropna(dim="Destination", how="all")
-
-        for row in city_data.Passengers:
-            count = int(row.values)
-            destination_index = airport_indexes[str(row.coords["Destination"].values)]
-
-            # Set both sides of the array to this value
-            heatmap_data[origin_index, destination_index] = count
-            heatmap_data[destination_index, origin_index] = count
+    Arguments:
+        heatmap_data {np.ndarray} -- Symmetric (airport, airport) traffic
+        all_airports {list} -- Airport names, in the same order as the heatmap
+        title {str} -- Chart title
 
+    Returns:
+        matplotlib.figure.Figure -- Figure holding the chart
+    """
     # Plot the data
     fig, ax = plt.subplots()
     plt.rcParams.update({"font.size": 14})
@@ -48,6 +33,21 @@ if __name__ == "__main__":
     cbar = ax.figure.colorbar(im, ax=ax)
     cbar.ax.set_ylabel("Total Traffic")
 
-    ax.set_title("Domestic Traffic - December 2019")
+    ax.set_title(title)
     fig.tight_layout()
+    return fig
+
+
+if __name__ == "__main__":
+    combined = util.load_cdf("Visualization/domestic.nc")
+
+    # Get data for Dec-2019 by default
+    # We'll make this animated later
+    # Keep in mind we want this heatmap to work both ways
+    data, all_airports, vmin, vmax = heatmap.od_tensor(
+        combined, months=[datetime.datetime(2019, 12, 1)]
+    )
+    heatmap_data = data[0]
+
+    plot_heatmap(heatmap_data, all_airports, "Domestic Traffic - December 2019")
     plt.show()
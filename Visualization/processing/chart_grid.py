@@ -1,5 +1,7 @@
-import util
+import argparse
+import query
 import matplotlib.pyplot as plt
+import numpy as np
 
 AUSTRALIAN_CITIES = [
     "Sydney",
@@ -10,29 +12,93 @@ AUSTRALIAN_CITIES = [
 ]
 FOREIGN_CITIES = ["Auckland", "Hong Kong", "Singapore", "Kuala Lumpur", "Tokyo"]
 
-if __name__ == "__main__":
-    # Load Data
-    combined = util.load_cdf("Visualization/international.nc")
+# Line colours for each variable in the rasterised grid, matching the matplotlib defaults
+RASTER_COLORS = np.array([[31, 119, 180], [255, 127, 14], [44, 160, 44]], np.uint8)
+
+
+def top_ports(index: dict, dim: str, n: int) -> list:
+    """Get the busiest ports along one dimension
+
+    Arguments:
+        index {dict} -- Route index from query.route_index
+        dim {str} -- Port dimension, eg. AustralianPort
+        n {int} -- Number of ports
+
+    Returns:
+        list -- Names of the ports with the most total traffic, busiest first
+    """
+    axis = index["dims"].index(dim)
+    others = tuple(i for i in range(index["values"].ndim) if i != axis)
+    totals = np.nansum(index["values"], axis=others)
+    order = np.argsort(-totals, kind="stable")[:n]
+    return [index[f"{dim}_names"][i] for i in order]
+
+
+def grid_values(index: dict, incoming_cities: list, outgoing_cities: list) -> tuple:
+    """Get the traffic on every pair of ports in a single selection
+
+    Arguments:
+        index {dict} -- Route index from query.route_index
+        incoming_cities {list} -- Australian ports, one per row
+        outgoing_cities {list} -- Foreign ports, one per column
+
+    Raises:
+        KeyError: If any port can't be found
+
+    Returns:
+        tuple -- (row, column, Month, variable) array, months, variables, and the matched row and column names
+    """
+    first, second = index["dims"]
+    rows = [query.resolve_port(index, first, name) for name in incoming_cities]
+    cols = [query.resolve_port(index, second, name) for name in outgoing_cities]
 
+    values = index["values"][np.ix_([i for i, _ in rows], [j for j, _ in cols])]
+    return (
+        values,
+        index["months"].values,
+        index["variables"],
+        [name for _, name in rows],
+        [name for _, name in cols],
+    )
+
+
+def plot_grid(
+    values: np.ndarray,
+    months: np.ndarray,
+    variables: list,
+    incoming_cities: list,
+    outgoing_cities: list,
+):
+    """Draw the traffic on each route as a grid of line charts
+    Each row is an Australian port, and each column is a foreign port
+
+    Arguments:
+        values {np.ndarray} -- (row, column, Month, variable) array from grid_values
+        months {np.ndarray} -- Month of each point
+        variables {list} -- Name of each variable, eg. PaxIn and PaxOut
+        incoming_cities {list} -- Australian ports, one per row
+        outgoing_cities {list} -- Foreign ports, one per column
+
+    Returns:
+        matplotlib.figure.Figure -- Figure holding the charts
+    """
     # Setup the graph
-    fig, axes = plt.subplots(nrows=len(AUSTRALIAN_CITIES), ncols=len(FOREIGN_CITIES))
+    fig, axes = plt.subplots(
+        nrows=len(incoming_cities), ncols=len(outgoing_cities), squeeze=False
+    )
     plt.rcParams.update({"font.size": 14})
 
     # Plot each incoming/outgoing pair
-    for xx, incoming in enumerate(AUSTRALIAN_CITIES):
-        for yy, outgoing in enumerate(FOREIGN_CITIES):
-            test = combined.sel(AustralianPort=incoming, ForeignPort=outgoing)[
-                ["PaxIn", "PaxOut"]
-            ]
-
-            test.to_dataframe().plot(ax=axes[xx, yy], legend=False)
-            axes[xx, yy].legend(loc="upper right", fontsize=10)
+    for xx in range(len(incoming_cities)):
+        for yy in range(len(outgoing_cities)):
+            axes[xx, yy].plot(months, values[xx, yy])
+            axes[xx, yy].legend(variables, loc="upper right", fontsize=10)
 
     # Handle axes labels
-    for ax, col in zip(axes[0, :], FOREIGN_CITIES):
+    for ax, col in zip(axes[0, :], outgoing_cities):
         ax.set_title(col)
 
-    for ax, row in zip(axes[:, 0], AUSTRALIAN_CITIES):
+    for ax, row in zip(axes[:, 0], incoming_cities):
         ax.set_ylabel(row, size="large")
 
     for ax in fig.get_axes():
@@ -44,4 +110,143 @@ if __name__ == "__main__":
     # Plot with no gaps
     fig.tight_layout()
     plt.subplots_adjust(wspace=0, hspace=0)
-    plt.show()
+    return fig
+
+
+def rasterise_grid(values: np.ndarray, width: int = 64, height: int = 24) -> np.ndarray:
+    """Draw a sparkline for every route straight into one RGB image
+    Every cell is resampled and drawn at once with numpy, so large grids stay fast
+    Each cell is scaled to its own minimum and maximum
+
+    Arguments:
+        values {np.ndarray} -- (row, column, Month, variable) array from grid_values
+
+    Keyword Arguments:
+        width {int} -- Width of each cell in pixels (default: {64})
+        height {int} -- Height of each cell in pixels (default: {24})
+
+    Returns:
+        np.ndarray -- (rows * height, columns * width, 3) image
+    """
+    rows, cols, months, count = values.shape
+
+    # Resample every series to one point per pixel column
+    x = np.linspace(0, months - 1, width)
+    left = np.floor(x).astype(int)
+    right = np.minimum(left + 1, months - 1)
+    step = (x - left)[:, None]
+    series = values[:, :, left] * (1 - step) + values[:, :, right] * step
+
+    # Scale each cell so the top row of pixels is its busiest month
+    with np.errstate(all="ignore"):
+        low = np.nanmin(values, axis=(2, 3), keepdims=True)
+        high = np.nanmax(values, axis=(2, 3), keepdims=True)
+        span = np.where(high > low, high - low, 1)
+        y = (1 - (series - low) / span) * (height - 1)
+
+    # Join each point to the next with a vertical run of pixels
+    top = np.fmin(y[:, :, :-1], y[:, :, 1:])
+    bottom = np.fmax(y[:, :, :-1], y[:, :, 1:])
+    pixels = np.arange(height)[:, None, None]
+    top, bottom = top[:, :, None], bottom[:, :, None]
+    lines = (pixels >= np.floor(top)) & (pixels <= np.ceil(bottom))
+
+    # Later variables are drawn over earlier ones
+    image = np.full((rows, cols, height, width - 1, 3), 255, np.uint8)
+    for v in range(count):
+        image[lines[..., v]] = RASTER_COLORS[v % len(RASTER_COLORS)]
+
+    # Light border between cells
+    image[:, :, -1, :] = 220
+    image = np.pad(image, ((0, 0), (0, 0), (0, 0), (0, 1), (0, 0)), constant_values=220)
+    return image.transpose(0, 2, 1, 3, 4).reshape(rows * height, cols * width, 3)
+
+
+def plot_raster(
+    image: np.ndarray,
+    incoming_cities: list,
+    outgoing_cities: list,
+    width: int = 64,
+    height: int = 24,
+):
+    """Show a rasterised grid with the port names along the edges
+
+    Arguments:
+        image {np.ndarray} -- Image from rasterise_grid
+        incoming_cities {list} -- Australian ports, one per row
+        outgoing_cities {list} -- Foreign ports, one per column
+
+    Keyword Arguments:
+        width {int} -- Width of each cell in pixels (default: {64})
+        height {int} -- Height of each cell in pixels (default: {24})
+
+    Returns:
+        matplotlib.figure.Figure -- Figure holding the grid
+    """
+    # Leave roughly one screen pixel per image pixel, plus room for the labels
+    fig, ax = plt.subplots()
+    fig.set_size_inches(
+        max(6.4, image.shape[1] / fig.dpi + 2), max(4.8, image.shape[0] / fig.dpi + 2)
+    )
+    ax.imshow(image, interpolation="nearest", aspect="auto")
+
+    ax.set_xticks(np.arange(len(outgoing_cities)) * width + width / 2)
+    ax.set_yticks(np.arange(len(incoming_cities)) * height + height / 2)
+    ax.set_xticklabels(outgoing_cities, fontsize=8)
+    ax.set_yticklabels(incoming_cities, fontsize=8)
+    ax.xaxis.tick_top()
+    plt.setp(ax.get_xticklabels(), rotation=90)
+
+    fig.tight_layout()
+    return fig
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Draw the traffic between Australian and foreign ports as a grid"
+    )
+    parser.add_argument(
+        "--input",
+        default="Visualization/international.nc",
+        help="Input dataset. Defaults to 'Visualization/international.nc'",
+    )
+    parser.add_argument("--incoming", nargs="*", help="Australian ports, one per row")
+    parser.add_argument("--outgoing", nargs="*", help="Foreign ports, one per column")
+    parser.add_argument(
+        "--top",
+        type=int,
+        help="Use the N busiest ports for any rows or columns that aren't given",
+    )
+    parser.add_argument(
+        "--raster",
+        action="store_true",
+        help="Draw sparklines straight into one image. Much faster for large grids",
+    )
+    parser.add_argument(
+        "--output", help="Save the grid to this file instead of showing it"
+    )
+    args = parser.parse_args()
+
+    # Load Data
+    index = query.route_index(args.input)
+    first, second = index["dims"]
+    incoming = args.incoming
+    outgoing = args.outgoing
+    if not incoming:
+        incoming = top_ports(index, first, args.top) if args.top else AUSTRALIAN_CITIES
+    if not outgoing:
+        outgoing = top_ports(index, second, args.top) if args.top else FOREIGN_CITIES
+
+    values, months, variables, incoming, outgoing = grid_values(
+        index, incoming, outgoing
+    )
+
+    if args.raster:
+        fig = plot_raster(rasterise_grid(values), incoming, outgoing)
+    else:
+        fig = plot_grid(values, months, variables, incoming, outgoing)
+
+    if args.output:
+        fig.savefig(args.output)
+    else:
+        plt.show()
@@ -1,5 +1,5 @@
 import datetime
-import util
+import query
 import matplotlib.pyplot as plt
 import matplotlib.colors as cm
 import numpy as np
@@ -14,21 +14,17 @@ AUSTRALIAN_CITIES = [
     "Darwin",
 ]
 
-if __name__ == "__main__":
-    # Load Data
-    combined = util.load_cdf("Visualization/international.nc")
-    years = combined.coords["Month"].values  # [x for x in range(2014, 2020)]
 
-    data = {}
-    for city in AUSTRALIAN_CITIES:
-        data[city] = []
-        city_data = combined.sel(AustralianPort=city)
+def plot_lines(data: dict, years: list):
+    """Draw the monthly arrivals for each city as a line chart
 
-        for year in years:
-            # Sum all the data for the year
-            yearly_total = city_data.sel(Month=year).sum(["ForeignPort"])
-            data[city].append(int(yearly_total.PaxIn))
+    Arguments:
+        data {dict} -- Arrivals for each city
+        years {list} -- Months for each point
 
+    Returns:
+        matplotlib.figure.Figure -- Figure holding the chart
+    """
     # Graph the data
     # We're doing a stacked barchart so this will be a little painful
     fig, ax = plt.subplots()
@@ -36,7 +32,9 @@ if __name__ == "__main__":
 
     for i, city in enumerate(data):
         ax.plot(
-            years, data[city], label=city,
+            years,
+            data[city],
+            label=city,
         )
 
     # Axis labels
@@ -45,4 +43,14 @@ if __name__ == "__main__":
     ax.legend()
 
     fig.tight_layout()
+    return fig
+
+
+if __name__ == "__main__":
+    # Load Data
+    table = query.port_table("Visualization/international.nc", AUSTRALIAN_CITIES)
+    data = {city: [int(x) for x in table[city].values] for city in table}
+    years = table.index.values  # [x for x in range(2014, 2020)]
+
+    plot_lines(data, years)
     plt.show()
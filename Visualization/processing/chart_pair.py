@@ -1,16 +1,124 @@
-import util
+import argparse
+import csv
+import os
+import query
 import matplotlib.pyplot as plt
 
-if __name__ == "__main__":
-    combined = util.load_cdf("Visualization/international.nc")
 
-    while True:
-        incoming = input("Australian Port: ")
-        outgoing = input("Foreign Port: ")
+def plot_pair(df, title: str):
+    """Draw the traffic on a single route
+
+    Arguments:
+        df {pd.DataFrame} -- Traffic from query.route_lookup
+        title {str} -- Chart title
+
+    Returns:
+        matplotlib.figure.Figure -- Figure holding the chart
+    """
+    ax = df.plot()
+    ax.set_title(title)
+    return ax.figure
+
+
+def read_pairs(filename: str) -> list:
+    """Read a list of routes to draw
+    Each line holds an Australian port and a foreign port, separated by a comma
+
+    Arguments:
+        filename {str} -- CSV file of routes
 
-        test = combined.sel(AustralianPort=incoming, ForeignPort=outgoing)[
-            ["PaxIn", "PaxOut"]
+    Returns:
+        list -- (Australian port, foreign port) pairs
+    """
+    with open(filename, newline="") as f:
+        return [
+            (row[0].strip(), row[1].strip())
+            for row in csv.reader(f)
+            if len(row) >= 2 and not row[0].startswith("#")
         ]
-        test.to_dataframe().plot()
-        plt.title(f"{incoming} - {outgoing}")
-        plt.show()
+
+
+def render_pairs(index: dict, pairs: list, output: str, verbose: bool = False) -> list:
+    """Save a chart for each route in one pass, without opening any windows
+
+    Arguments:
+        index {dict} -- Route index from query.route_index
+        pairs {list} -- (Australian port, foreign port) pairs
+        output {str} -- Directory to save the charts to
+
+    Keyword Arguments:
+        verbose {bool} -- Enable additional output logging (default: {False})
+
+    Returns:
+        list -- Saved chart filenames
+    """
+    os.makedirs(output, exist_ok=True)
+
+    filenames = []
+    for incoming, outgoing in pairs:
+        try:
+            df = query.route_lookup(index, incoming, outgoing)
+        except KeyError as e:
+            print(f"Skipping {incoming} - {outgoing}: {e.args[0]}")
+            continue
+
+        # Name the file after the ports that were actually matched
+        incoming, outgoing = df.attrs["route"]
+        filename = os.path.join(output, f"{incoming}-{outgoing}.png".replace(" ", "_"))
+        fig = plot_pair(df, f"{incoming} - {outgoing}")
+        fig.savefig(filename)
+        plt.close(fig)
+
+        filenames.append(filename)
+        if verbose:
+            print(filename)
+    return filenames
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Draw the traffic between an Australian port and a foreign port"
+    )
+    parser.add_argument(
+        "--input",
+        default="Visualization/international.nc",
+        help="Input dataset. Defaults to 'Visualization/international.nc'",
+    )
+    parser.add_argument(
+        "--batch",
+        help="CSV file of port pairs to save as charts, instead of asking for each pair",
+    )
+    parser.add_argument(
+        "--output",
+        default="Visualization/graphs/pairs",
+        help="Directory for charts in batch mode. Defaults to 'Visualization/graphs/pairs'",
+    )
+    parser.add_argument(
+        "--verbose", action="store_true", help="Enable additional output logging"
+    )
+    args = parser.parse_args()
+
+    # Load every route up front so each lookup is just an array slice
+    index = query.route_index(args.input)
+
+    if args.batch:
+        plt.switch_backend("Agg")
+        render_pairs(index, read_pairs(args.batch), args.output, verbose=args.verbose)
+    else:
+        while True:
+            try:
+                incoming = input("Australian Port: ")
+                outgoing = input("Foreign Port: ")
+            except (EOFError, KeyboardInterrupt):
+                break
+
+            # Typos shouldn't end the session
+            try:
+                test = query.route_lookup(index, incoming, outgoing)
+            except KeyError as e:
+                print(e.args[0])
+                continue
+
+            incoming, outgoing = test.attrs["route"]
+            plot_pair(test, f"{incoming} - {outgoing}")
+            plt.show()
@@ -1,5 +1,5 @@
 import datetime
-import util
+import query
 import matplotlib.pyplot as plt
 import matplotlib.colors as cm
 import numpy as np
@@ -16,21 +16,17 @@ AUSTRALIAN_CITIES = [
 
 COLORS = ["#fc5c65", "#fd9644", "#fed330", "#26de81", "#4b7bec", "#a55eea", "#f368e0"]
 
-if __name__ == "__main__":
-    # Load Data
-    combined = util.load_cdf("Visualization/international.nc")
-    years = combined.coords["Month"].values  # [x for x in range(2014, 2020)]
 
-    data = {}
-    for city in AUSTRALIAN_CITIES:
-        data[city] = []
-        city_data = combined.sel(AustralianPort=city)
+def plot_stacked_bar(data: dict, years: list):
+    """Draw the monthly arrivals for each city as a stacked bar chart
 
-        for year in years:
-            # Sum all the data for the year
-            yearly_total = city_data.sel(Month=year).sum(["ForeignPort"])
-            data[city].append(int(yearly_total.PaxIn))
+    Arguments:
+        data {dict} -- Arrivals for each city
+        years {list} -- Months for each bar
 
+    Returns:
+        matplotlib.figure.Figure -- Figure holding the chart
+    """
     # Graph the data
     # We're doing a stacked barchart so this will be a little painful
     fig, ax = plt.subplots()
@@ -56,4 +52,14 @@ if __name__ == "__main__":
     ax.legend(fontsize=12)
 
     fig.tight_layout()
+    return fig
+
+
+if __name__ == "__main__":
+    # Load Data
+    table = query.port_table("Visualization/international.nc", AUSTRALIAN_CITIES)
+    data = {city: [int(x) for x in table[city].values] for city in table}
+    years = table.index.values  # [x for x in range(2014, 2020)]
+
+    plot_stacked_bar(data, years)
     plt.show()
@@ -1,7 +1,6 @@
 import util
+import spectral
 import matplotlib.pyplot as plt
-import numpy as np
-from scipy.fft import fft
 
 AUSTRALIAN_CITIES = [
     "Sydney",
@@ -12,28 +11,26 @@ AUSTRALIAN_CITIES = [
 ]
 
 if __name__ == "__main__":
-    combined = util.load_cdf("Visualization/international.nc")
-    months = combined.coords["Month"].values
+    combined = util.load_cdf(
+        "Visualization/international.nc",
+        variables=["PaxIn", "PaxOut"],
+        ports=AUSTRALIAN_CITIES,
+    )
 
-    # Get the total for Sydney
-    sydney_data = []
-    city_data = combined.sel(AustralianPort=AUSTRALIAN_CITIES[0])
+    # Monthly totals for every city and direction, transformed in one go
+    matrix = spectral.port_matrix(combined)
+    frequencies, amplitudes = spectral.spectrum(matrix.values)
 
-    for month in months:
-        # Sum all the data for the year
-        yearly_total = city_data.sel(Month=month).sum(["ForeignPort"])
-        sydney_data.append(int(yearly_total.PaxIn))
+    # Strongest cycles for each city
+    print(spectral.dominant_periods(matrix).to_string(index=False))
 
-    # plt.plot(months, sydney_data)
-    plt.show()
-
-    # Fourier transform code pretty much directly taken from the scipy example
-    # https://docs.scipy.org/doc/scipy/reference/tutorial/fft.html
-    N = len(months)  # Number of sample points
-    T = 1.0 / 800.0  # Samplce spacing
-    yf = fft(sydney_data)
-    xf = np.linspace(0.0, 1.0 / (2.0 * T), N // 2)
+    # Plot the arrivals spectrum for each city, skipping the constant term
+    fig, ax = plt.subplots()
+    for i, city in enumerate(matrix.coords["Port"].values):
+        ax.plot(frequencies[1:], amplitudes[i, 0, 1:], label=city)
 
-    # I have 0 idea what this graph means
-    plt.plot(xf, 2.0 / N * np.abs(yf[0 : N // 2]))
+    ax.set_xlabel("Cycles per Year")
+    ax.set_ylabel("Amplitude (Arrivals)")
+    ax.set_title("Seasonality of International Arrivals")
+    ax.legend()
     plt.show()
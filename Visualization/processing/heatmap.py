@@ -0,0 +1,412 @@
+import collections
+import os
+import queue
+import shutil
+import subprocess
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib.pyplot as plt
+import numpy as np
+import xarray as xr
+
+# Figure used by each rendering process, set up once by init_renderer
+RENDERER = {}
+
+
+def all_airports(ds: xr.Dataset) -> list:
+    """Get every airport that shows up as either an origin or a destination
+
+    Arguments:
+        ds {xr.Dataset} -- Dense domestic dataset
+
+    Returns:
+        list -- Sorted airport names
+    """
+    origins = ds.coords["Origin"].values
+    destinations = ds.coords["Destination"].values
+    return sorted(set(origins) | set(destinations))
+
+
+def symmetrise(counts: np.ndarray) -> np.ndarray:
+    """Make each (origin, destination) matrix symmetric
+    Each cell takes the route from the later origin, and falls back to the reverse route
+    This matches filling the matrix one origin at a time in sorted order
+
+    Arguments:
+        counts {np.ndarray} -- Traffic with the origin and destination as the last two axes
+
+    Returns:
+        np.ndarray -- Symmetric traffic, with NaN where neither direction is published
+    """
+    size = counts.shape[-1]
+    later = np.tril(np.ones((size, size), dtype=bool))
+    reverse = np.swapaxes(counts, -1, -2)
+    first = np.where(later, counts, reverse)
+    second = np.where(later, reverse, counts)
+    return np.where(np.isnan(first), second, first)
+
+
+def od_tensor(ds: xr.Dataset, months: list = None, variable: str = "Passengers"):
+    """Get the traffic between every pair of airports for every month as one array
+    Both axes use the same sorted airport list, and each matrix is made symmetric
+    If both directions of a route are published, the one from the later origin wins
+    Routes with no published traffic are zero
+
+    Arguments:
+        ds {xr.Dataset} -- Dense domestic dataset
+
+    Keyword Arguments:
+        months {list} -- Months to include. Defaults to every month in the dataset (default: {None})
+        variable {str} -- Count variable to use (default: {"Passengers"})
+
+    Returns:
+        tuple -- (Month, airport, airport) array, airport names, and the minimum and maximum published traffic
+    """
+    airports = all_airports(ds)
+    counts = ds[variable].reindex(Origin=airports, Destination=airports)
+    if months is not None:
+        counts = counts.reindex(Month=months)
+    counts = counts.transpose("Month", "Origin", "Destination").values.astype(
+        np.float64
+    )
+
+    data = symmetrise(counts)
+
+    # Global scale, so every frame of an animation shares the same colours
+    if np.isnan(data).all():
+        vmin, vmax = 0.0, 0.0
+    else:
+        vmin, vmax = float(np.nanmin(data)), float(np.nanmax(data))
+
+    return np.nan_to_num(data, nan=0.0), airports, vmin, vmax
+
+
+def od_range(
+    ds: xr.Dataset, months: list, airports: list = None, variable: str = "Passengers"
+) -> tuple:
+    """Get the minimum and maximum published traffic over a range of months
+    Each month is made symmetric first, so this matches the scale from od_tensor
+    The reduction runs chunk by chunk on lazily loaded datasets
+
+    Arguments:
+        ds {xr.Dataset} -- Dense domestic dataset
+        months {list} -- Months to include
+
+    Keyword Arguments:
+        airports {list} -- Airports for both axes. Defaults to every airport (default: {None})
+        variable {str} -- Count variable to use (default: {"Passengers"})
+
+    Returns:
+        tuple -- Minimum and maximum traffic
+    """
+    airports = airports if airports else all_airports(ds)
+    months = np.array(months, dtype="datetime64[ns]")
+    counts = ds[variable].sel(Month=ds.coords["Month"].isin(months))
+    if not counts.size:
+        return 0.0, 0.0
+
+    counts = counts.reindex(Origin=airports, Destination=airports).astype(np.float64)
+    if counts.chunks:
+        # Each month needs the whole matrix to be made symmetric
+        counts = counts.chunk({"Origin": -1, "Destination": -1})
+    data = xr.apply_ufunc(
+        symmetrise,
+        counts,
+        input_core_dims=[["Origin", "Destination"]],
+        output_core_dims=[["Origin", "Destination"]],
+        dask="parallelized",
+        output_dtypes=[np.float64],
+    )
+
+    vmin, vmax = float(data.min()), float(data.max())
+    if np.isnan(vmin):
+        return 0.0, 0.0
+    return vmin, vmax
+
+
+def od_frames(
+    ds: xr.Dataset,
+    months: list,
+    airports: list = None,
+    variable: str = "Passengers",
+    buffer: int = 4,
+):
+    """Stream the traffic between every pair of airports one month at a time
+    A background thread reads ahead into a small buffer, so memory stays constant
+    Each matrix is the same as the matching month of od_tensor
+
+    Arguments:
+        ds {xr.Dataset} -- Dense domestic dataset, ideally loaded lazily with Month chunks
+        months {list} -- Months to include
+
+    Keyword Arguments:
+        airports {list} -- Airports for both axes. Defaults to every airport (default: {None})
+        variable {str} -- Count variable to use (default: {"Passengers"})
+        buffer {int} -- Number of months read ahead of the consumer (default: {4})
+
+    Yields:
+        tuple -- Frame number, month and symmetric (airport, airport) array
+    """
+    airports = airports if airports else all_airports(ds)
+    counts = ds[variable].reindex(Origin=airports, Destination=airports)
+    counts = counts.transpose("Month", "Origin", "Destination")
+
+    frames = queue.Queue(maxsize=buffer)
+    stop = threading.Event()
+
+    def read_ahead():
+        try:
+            for i, month in enumerate(months):
+                if month in counts.indexes["Month"]:
+                    matrix = counts.sel(Month=month).values.astype(np.float64)
+                else:
+                    matrix = np.full((len(airports), len(airports)), np.nan)
+                matrix = np.nan_to_num(symmetrise(matrix), nan=0.0)
+
+                # Give up once the consumer has stopped
+                while not stop.is_set():
+                    try:
+                        frames.put((i, month, matrix), timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                if stop.is_set():
+                    return
+        except Exception as e:
+            frames.put(e)
+            return
+        frames.put(None)
+
+    thread = threading.Thread(target=read_ahead, daemon=True)
+    thread.start()
+    try:
+        while True:
+            frame = frames.get()
+            if frame is None:
+                break
+            if isinstance(frame, Exception):
+                raise frame
+            yield frame
+    finally:
+        stop.set()
+
+
+def setup_figure(airports: list, vmin: float, vmax: float) -> tuple:
+    """Setup the axis for the domestic heatmap animation
+
+    Arguments:
+        airports {list} -- Airport names, in the same order as the heatmap
+        vmin {float} -- Bottom of the colour scale
+        vmax {float} -- Top of the colour scale
+
+    Returns:
+        tuple -- Figure, axis and image
+    """
+    fig, ax = plt.subplots()
+    fig.set_size_inches(16, 9)
+    img = ax.imshow(
+        np.zeros((len(airports), len(airports))), cmap="plasma", vmin=vmin, vmax=vmax
+    )
+
+    ax.set_xticks(np.arange(len(airports)))
+    ax.set_yticks(np.arange(len(airports)))
+    ax.set_xticklabels(airports)
+    ax.set_yticklabels(airports)
+    plt.setp(ax.get_xticklabels(), rotation=45, ha="right", rotation_mode="anchor")
+
+    # Adjust colorbar
+    cbar = ax.figure.colorbar(img, ax=ax)
+    cbar.ax.set_ylabel("Total Traffic")
+
+    return fig, ax, img
+
+
+def init_renderer(
+    airports: list, vmin: float, vmax: float, dpi: int, frames: str = None
+):
+    """Setup the figure for a rendering process
+    Every process draws with the Agg backend and reuses a single figure
+
+    Arguments:
+        airports {list} -- Airport names
+        vmin {float} -- Bottom of the colour scale
+        vmax {float} -- Top of the colour scale
+        dpi {int} -- Resolution of each frame
+
+    Keyword Arguments:
+        frames {str} -- Filename pattern for PNG frames. Leave blank to return raw RGB frames (default: {None})
+    """
+    plt.switch_backend("Agg")
+    fig, ax, img = setup_figure(airports, vmin, vmax)
+    fig.set_dpi(dpi)
+    RENDERER.update(fig=fig, ax=ax, img=img, dpi=dpi, frames=frames)
+
+
+def render_frame(i: int, month, matrix: np.ndarray):
+    """Draw a single frame of the animation
+    init_renderer must be called first in this process
+
+    Arguments:
+        i {int} -- Frame number
+        month {datetime.datetime} -- Month shown in the frame
+        matrix {np.ndarray} -- Symmetric (airport, airport) array
+
+    Returns:
+        np.ndarray -- (height, width, 3) RGB frame, or the PNG filename if frames are being saved
+    """
+    RENDERER["ax"].set_title(month.strftime("%m-%Y"))
+    RENDERER["img"].set_data(matrix)
+
+    if RENDERER["frames"]:
+        filename = RENDERER["frames"].format(i)
+        RENDERER["fig"].savefig(filename, dpi=RENDERER["dpi"])
+        return filename
+
+    canvas = RENDERER["fig"].canvas
+    canvas.draw()
+    return np.ascontiguousarray(np.asarray(canvas.buffer_rgba())[:, :, :3])
+
+
+def ordered_frames(executor: ProcessPoolExecutor, frames, ahead: int):
+    """Render frames in parallel, yielding them in order
+    Only a limited number of frames are read and in flight, to keep memory bounded
+
+    Arguments:
+        executor {ProcessPoolExecutor} -- Pool of rendering processes
+        frames {iterable} -- Frame number, month and matrix of each frame, as from od_frames
+        ahead {int} -- Maximum number of frames rendered ahead of the consumer
+
+    Yields:
+        np.ndarray -- Result of render_frame for each frame
+    """
+    pending = collections.deque()
+    for frame in frames:
+        pending.append(executor.submit(render_frame, *frame))
+        if len(pending) >= ahead:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def ffmpeg_command(ffmpeg: str, shape: tuple, fps: int, output: str) -> list:
+    """Get the ffmpeg command that encodes raw RGB frames from stdin
+
+    Arguments:
+        ffmpeg {str} -- Path to ffmpeg
+        shape {tuple} -- Shape of each frame, as (height, width, 3)
+        fps {int} -- Frames per second
+        output {str} -- Output video file
+
+    Returns:
+        list -- Command line arguments
+    """
+    height, width = shape[:2]
+
+    # libx264 needs even dimensions
+    return [
+        ffmpeg,
+        "-y",
+        "-loglevel",
+        "error",
+        "-f",
+        "rawvideo",
+        "-pix_fmt",
+        "rgb24",
+        "-s",
+        f"{width}x{height}",
+        "-r",
+        str(fps),
+        "-i",
+        "-",
+        "-vf",
+        "pad=ceil(iw/2)*2:ceil(ih/2)*2",
+        "-vcodec",
+        "libx264",
+        "-pix_fmt",
+        "yuv420p",
+        output,
+    ]
+
+
+def render_animation(
+    frames,
+    airports: list,
+    vmin: float,
+    vmax: float,
+    output: str,
+    count: int = None,
+    fps: int = 12,
+    dpi: int = 100,
+    jobs: int = None,
+    verbose: bool = False,
+) -> str:
+    """Render the domestic heatmap animation across a pool of processes
+    Frames are read as they are needed, so streaming them from od_frames keeps memory constant
+    Frames are streamed in order to ffmpeg as raw RGB video
+    If ffmpeg isn't installed, numbered PNG frames are written instead
+
+    Arguments:
+        frames {iterable} -- Frame number, month and symmetric (airport, airport) array of each frame, as from od_frames
+        airports {list} -- Airport names
+        vmin {float} -- Bottom of the colour scale
+        vmax {float} -- Top of the colour scale
+        output {str} -- Output video file
+
+    Keyword Arguments:
+        count {int} -- Number of frames, used for logging (default: {None})
+        fps {int} -- Frames per second (default: {12})
+        dpi {int} -- Resolution of each frame (default: {100})
+        jobs {int} -- Number of rendering processes. Defaults to the number of CPUs (default: {None})
+        verbose {bool} -- Enable additional output logging (default: {False})
+
+    Returns:
+        str -- Output video file, or the directory of PNG frames
+    """
+    if count == 0:
+        raise ValueError("No frames to render")
+
+    jobs = jobs if jobs else os.cpu_count()
+    ffmpeg = shutil.which("ffmpeg")
+    total = f"/{count}" if count else ""
+
+    pattern = None
+    if not ffmpeg:
+        directory = os.path.splitext(output)[0] + "_frames"
+        os.makedirs(directory, exist_ok=True)
+        pattern = os.path.join(directory, "{:04d}.png")
+        if verbose:
+            print(f"ffmpeg not found, writing frames to {directory}")
+
+    initargs = (airports, vmin, vmax, dpi, pattern)
+    with ProcessPoolExecutor(
+        max_workers=jobs, initializer=init_renderer, initargs=initargs
+    ) as executor:
+        if not ffmpeg:
+            for filename in ordered_frames(executor, frames, jobs * 2):
+                if verbose:
+                    print(filename)
+            return directory
+
+        process = None
+        try:
+            for i, frame in enumerate(ordered_frames(executor, frames, jobs * 2)):
+                # Frame size is only known once the first frame is drawn
+                if process is None:
+                    process = subprocess.Popen(
+                        ffmpeg_command(ffmpeg, frame.shape, fps, output),
+                        stdin=subprocess.PIPE,
+                    )
+                process.stdin.write(frame.tobytes())
+                if verbose:
+                    print(f"Frame {i + 1}{total}")
+        finally:
+            if process is not None:
+                process.stdin.close()
+                process.wait()
+
+    if process is None:
+        raise ValueError("No frames to render")
+    if process.returncode != 0:
+        raise RuntimeError(f"ffmpeg exited with code {process.returncode}")
+    return output
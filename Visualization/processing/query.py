@@ -0,0 +1,355 @@
+import difflib
+import functools
+import os
+import re
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+import util
+
+# Number of results kept by each memoised query
+MEMO_SIZE = 256
+
+# How close a misspelt port name has to be to be accepted, between 0 and 1
+FUZZY_CUTOFF = 0.75
+
+# Totals added together for each direction, by the first port dimension of the dataset
+# Each total is a count variable, and whether it is kept for the first or second port dimension
+DIRECTIONS = {
+    "AustralianPort": {
+        "in": [("PaxIn", 0)],
+        "out": [("PaxOut", 0)],
+        "both": [("PaxIn", 0), ("PaxOut", 0)],
+    },
+    "Origin": {
+        "in": [("Passengers", 1)],
+        "out": [("Passengers", 0)],
+        "both": [("Passengers", 0), ("Passengers", 1)],
+    },
+}
+
+
+def fingerprint(path: str) -> tuple:
+    """Get a fingerprint of a saved dataset that changes whenever it is rewritten
+
+    Arguments:
+        path {str} -- Saved dataset
+
+    Returns:
+        tuple -- Absolute path, size and modification time
+    """
+    stat = os.stat(path)
+    return (os.path.abspath(path), util.cdf_size(path), stat.st_mtime_ns)
+
+
+@functools.lru_cache(maxsize=4)
+def open_dataset(key: tuple) -> tuple:
+    """Open a dataset and its rollups, if it has any
+
+    Arguments:
+        key {tuple} -- Fingerprint of the dataset
+
+    Returns:
+        tuple -- Dataset, and rollups dataset or None
+    """
+    path = key[0]
+    ds = util.load_cdf(path)
+    try:
+        rollups = util.load_rollups(path)
+    except (OSError, KeyError, ValueError):
+        rollups = None
+    return ds, rollups
+
+
+def dataset(path: str) -> xr.Dataset:
+    """Get a saved dataset, opening it only once until it is rewritten
+
+    Arguments:
+        path {str} -- Saved dataset
+
+    Returns:
+        xr.Dataset -- Dense dataset
+    """
+    return open_dataset(fingerprint(path))[0]
+
+
+def port_dims(ds: xr.Dataset) -> tuple:
+    """Get the port dimensions of a dataset
+
+    Arguments:
+        ds {xr.Dataset} -- Dense dataset
+
+    Returns:
+        tuple -- First and second port dimensions, eg. AustralianPort and ForeignPort
+    """
+    for dim in util.PORT_DIMS:
+        if dim in ds.dims:
+            other = [d for d in ds.dims if d not in (dim, "Month")]
+            return dim, other[0]
+    raise KeyError("Dataset has no known port dimension")
+
+
+@functools.lru_cache(maxsize=MEMO_SIZE)
+def port_totals(key: tuple, dim: str, variable: str, freq: str) -> xr.DataArray:
+    """Get the totals of a variable for every port along one dimension
+    Pre-computed rollups are used when the dataset has them
+
+    Arguments:
+        key {tuple} -- Fingerprint of the dataset
+        dim {str} -- Port dimension to keep the totals for
+        variable {str} -- Count variable to sum
+        freq {str} -- Either "monthly" or "yearly"
+
+    Returns:
+        xr.DataArray -- Totals with dimensions (dim, Month) or (dim, Year)
+    """
+    ds, rollups = open_dataset(key)
+    name = util.rollup_name(variable, dim, freq)
+    if rollups is not None and name in rollups:
+        return rollups[name]
+
+    others = [d for d in ds[variable].dims if d not in (dim, "Month")]
+    totals = ds[variable].sum(others)
+    if freq == "yearly":
+        totals = totals.groupby("Month.year").sum().rename(year="Year")
+    return totals
+
+
+@functools.lru_cache(maxsize=MEMO_SIZE)
+def cached_port_series(key: tuple, port: str, direction: str, freq: str) -> pd.Series:
+    """Memoised version of port_series, keyed by the dataset fingerprint"""
+    ds, _ = open_dataset(key)
+    dims = port_dims(ds)
+    if direction not in DIRECTIONS[dims[0]]:
+        raise ValueError(f"Unknown direction: {direction}")
+    if freq not in ("monthly", "yearly"):
+        raise ValueError(f"Unknown frequency: {freq}")
+
+    # Some airports only show up on one side of the domestic routes
+    series = []
+    for variable, position in DIRECTIONS[dims[0]][direction]:
+        totals = port_totals(key, dims[position], variable, freq)
+        if port in totals.coords[dims[position]].values:
+            series.append(totals.sel({dims[position]: port}).to_pandas())
+    if not series:
+        raise KeyError(f"Unknown port: {port}")
+
+    return sum(series).astype(np.float64).rename(port)
+
+
+@functools.lru_cache(maxsize=MEMO_SIZE)
+def cached_route_series(key: tuple, a: str, b: str) -> pd.DataFrame:
+    """Memoised version of route_series, keyed by the dataset fingerprint"""
+    ds, _ = open_dataset(key)
+    first, second = port_dims(ds)
+    variables = list(dict.fromkeys(v for v, _ in DIRECTIONS[first]["both"]))
+    return (
+        ds[variables]
+        .sel({first: a, second: b})
+        .to_dataframe()[variables]
+        .astype(np.float64)
+    )
+
+
+@functools.lru_cache(maxsize=MEMO_SIZE)
+def cached_od_matrix(key: tuple, month: pd.Timestamp, variable: str) -> pd.DataFrame:
+    """Memoised version of od_matrix, keyed by the dataset fingerprint"""
+    ds, _ = open_dataset(key)
+    first, second = port_dims(ds)
+    variable = variable if variable else DIRECTIONS[first]["both"][0][0]
+    return (
+        ds[variable]
+        .sel(Month=month)
+        .transpose(first, second)
+        .to_pandas()
+        .astype(np.float64)
+    )
+
+
+def port_series(
+    path: str, port: str, direction: str = "in", freq: str = "monthly"
+) -> pd.Series:
+    """Get the total traffic through a port over time
+    For international data, in and out are arrivals and departures
+    For domestic data, in and out are passengers flying to and from the airport
+
+    Arguments:
+        path {str} -- Saved dataset
+        port {str} -- Australian port or domestic airport
+
+    Keyword Arguments:
+        direction {str} -- Either "in", "out" or "both" (default: {"in"})
+        freq {str} -- Either "monthly" or "yearly" (default: {"monthly"})
+
+    Returns:
+        pd.Series -- Total passengers indexed by Month or Year
+    """
+    return cached_port_series(fingerprint(path), port, direction, freq).copy()
+
+
+def port_table(
+    path: str, ports: list, direction: str = "in", freq: str = "monthly"
+) -> pd.DataFrame:
+    """Get the total traffic through several ports over time
+
+    Arguments:
+        path {str} -- Saved dataset
+        ports {list} -- Australian ports or domestic airports
+
+    Keyword Arguments:
+        direction {str} -- Either "in", "out" or "both" (default: {"in"})
+        freq {str} -- Either "monthly" or "yearly" (default: {"monthly"})
+
+    Returns:
+        pd.DataFrame -- Total passengers indexed by Month or Year, with one column for each port
+    """
+    return pd.concat(
+        [port_series(path, port, direction, freq) for port in ports], axis=1
+    )
+
+
+def route_series(path: str, a: str, b: str) -> pd.DataFrame:
+    """Get the traffic on a single route over time
+
+    Arguments:
+        path {str} -- Saved dataset
+        a {str} -- Australian port or origin airport
+        b {str} -- Foreign port or destination airport
+
+    Returns:
+        pd.DataFrame -- Passengers indexed by Month, with PaxIn and PaxOut or Passengers columns
+    """
+    return cached_route_series(fingerprint(path), a, b).copy()
+
+
+def od_matrix(path: str, month, variable: str = None) -> pd.DataFrame:
+    """Get the traffic between every pair of ports in a single month
+
+    Arguments:
+        path {str} -- Saved dataset
+        month {datetime} -- Month to get the traffic for
+
+    Keyword Arguments:
+        variable {str} -- Count variable to use. Defaults to PaxIn or Passengers (default: {None})
+
+    Returns:
+        pd.DataFrame -- Passengers with one row for each Australian port or origin, and one column for each foreign port or destination
+    """
+    return cached_od_matrix(fingerprint(path), pd.Timestamp(month), variable).copy()
+
+
+def normalise_port(name: str) -> str:
+    """Normalise a port name for lookups
+    Case, punctuation and repeated whitespace are ignored
+
+    Arguments:
+        name {str} -- Port name
+
+    Returns:
+        str -- Normalised name
+    """
+    name = re.sub(r"[^\w\s]", " ", str(name).casefold())
+    return " ".join(name.split())
+
+
+@functools.lru_cache(maxsize=4)
+def cached_route_index(key: tuple) -> dict:
+    """Memoised version of route_index, keyed by the dataset fingerprint"""
+    ds, _ = open_dataset(key)
+    first, second = port_dims(ds)
+    variables = list(dict.fromkeys(v for v, _ in DIRECTIONS[first]["both"]))
+
+    # One contiguous block per route, so a lookup is a single slice
+    values = np.ascontiguousarray(
+        ds[variables]
+        .to_array("variable")
+        .transpose(first, second, "Month", "variable")
+        .values.astype(np.float64)
+    )
+
+    index = {"dims": (first, second), "variables": variables, "values": values}
+    index["months"] = pd.DatetimeIndex(ds.coords["Month"].values, name="Month")
+    for dim in (first, second):
+        names = [str(name) for name in ds.coords[dim].values]
+        index[dim] = {normalise_port(name): i for i, name in enumerate(names)}
+        index[f"{dim}_names"] = names
+    return index
+
+
+def route_index(path: str) -> dict:
+    """Get an index of every route in a dataset, for fast repeated lookups
+    The traffic is held in one contiguous (port, port, Month, variable) array
+
+    Arguments:
+        path {str} -- Saved dataset
+
+    Returns:
+        dict -- Route index for resolve_port and route_lookup
+    """
+    return cached_route_index(fingerprint(path))
+
+
+def resolve_port(index: dict, dim: str, name: str) -> tuple:
+    """Find the position of a port, allowing for small spelling mistakes
+
+    Arguments:
+        index {dict} -- Route index from route_index
+        dim {str} -- Port dimension to search, eg. AustralianPort
+        name {str} -- Port name
+
+    Raises:
+        KeyError: If no port is close enough to the name
+
+    Returns:
+        tuple -- Position of the port, and its name in the dataset
+    """
+    positions = index[dim]
+    key = normalise_port(name)
+    if key not in positions:
+        matches = difflib.get_close_matches(key, positions, n=1, cutoff=FUZZY_CUTOFF)
+        if not matches:
+            raise KeyError(f"Unknown {dim}: {name}")
+        key = matches[0]
+
+    position = positions[key]
+    return position, index[f"{dim}_names"][position]
+
+
+def route_lookup(index: dict, a: str, b: str) -> pd.DataFrame:
+    """Get the traffic on a single route from a route index
+
+    Arguments:
+        index {dict} -- Route index from route_index
+        a {str} -- Australian port or origin airport, matched loosely
+        b {str} -- Foreign port or destination airport, matched loosely
+
+    Raises:
+        KeyError: If either port can't be found
+
+    Returns:
+        pd.DataFrame -- Passengers indexed by Month, named after the matched ports
+    """
+    first, second = index["dims"]
+    i, a = resolve_port(index, first, a)
+    j, b = resolve_port(index, second, b)
+
+    df = pd.DataFrame(
+        index["values"][i, j], index=index["months"], columns=index["variables"]
+    )
+    df.attrs["route"] = (a, b)
+    return df
+
+
+def clear_memo():
+    """Forget every memoised query result and open dataset"""
+    for func in (
+        cached_port_series,
+        cached_route_series,
+        cached_od_matrix,
+        cached_route_index,
+        port_totals,
+    ):
+        func.cache_clear()
+    open_dataset.cache_clear()
@@ -0,0 +1,371 @@
+import argparse
+import datetime
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib.pyplot as plt
+
+import chart_cache
+import chart_domestic_heatmap
+import chart_grid
+import chart_line
+import chart_stacked_bar
+import chart_timewheel_domestic
+import chart_timewheel_inbound
+import chart_timewheel_outbound
+import heatmap
+import query
+import timewheel
+
+# Size of the saved graphs, matching a maximised window
+FIGURE_SIZE = (19.2, 9.83)
+
+TIMEWHEEL_YEARS = [x for x in range(2004, 2020)]
+HEATMAP_MONTH = datetime.datetime(2019, 12, 1)
+
+# Every graph, with the plotting function and the aggregate it is drawn from
+GRAPHS = {
+    "01-stacked-bar-chart": (chart_stacked_bar.plot_stacked_bar, "arrivals"),
+    "02-trend-lines": (chart_grid.plot_grid, "routes"),
+    "03-timewheels-inbound": (timewheel.plot_timewheels, "timewheels_inbound"),
+    "03-timewheels-outbound": (timewheel.plot_timewheels, "timewheels_outbound"),
+    "04-domesticheatmap": (chart_domestic_heatmap.plot_heatmap, "domestic_heatmap"),
+    "05-basic-lines": (chart_line.plot_lines, "arrivals"),
+    "06-timewheels-domestic": (timewheel.plot_timewheels, "timewheels_domestic"),
+}
+
+
+def arrivals(paths: dict, cities: list) -> tuple:
+    """Monthly arrivals for the stacked bar and line charts"""
+    table = query.port_table(paths["international"], cities)
+    data = {city: [int(x) for x in table[city].values] for city in table}
+    return data, table.index.values
+
+
+def routes(paths: dict, incoming_cities: list, outgoing_cities: list) -> tuple:
+    """Traffic on each route in the grid of line charts"""
+    index = query.route_index(paths["international"])
+    return chart_grid.grid_values(index, incoming_cities, outgoing_cities)
+
+
+def timewheels(
+    paths: dict, dataset: str, cities: list, years: list, direction: str, title: str
+) -> tuple:
+    """Monthly traffic for one set of timewheels"""
+    ds = query.dataset(paths[dataset])
+    data = timewheel.timewheel_tensor(ds, cities, years, direction)
+    return data, cities, years, title
+
+
+def domestic_heatmap(paths: dict, month: datetime.datetime, title: str) -> tuple:
+    """Traffic between every pair of airports for the domestic heatmap"""
+    ds = query.dataset(paths["domestic"])
+    data, airports, _, _ = heatmap.od_tensor(ds, months=[month])
+    return data[0], airports, title
+
+
+# Functions that build the arguments for each plotting function
+# Each has the datasets it reads, and the parameters it is called with
+AGGREGATES = {
+    "arrivals": (
+        arrivals,
+        ["international"],
+        {"cities": chart_line.AUSTRALIAN_CITIES},
+    ),
+    "routes": (
+        routes,
+        ["international"],
+        {
+            "incoming_cities": chart_grid.AUSTRALIAN_CITIES,
+            "outgoing_cities": chart_grid.FOREIGN_CITIES,
+        },
+    ),
+    "timewheels_inbound": (
+        timewheels,
+        ["international"],
+        {
+            "dataset": "international",
+            "cities": chart_timewheel_inbound.AUSTRALIAN_CITIES,
+            "years": TIMEWHEEL_YEARS,
+            "direction": "in",
+            "title": "Total Monthly Arrivals",
+        },
+    ),
+    "timewheels_outbound": (
+        timewheels,
+        ["international"],
+        {
+            "dataset": "international",
+            "cities": chart_timewheel_outbound.AUSTRALIAN_CITIES,
+            "years": TIMEWHEEL_YEARS,
+            "direction": "out",
+            "title": "Total Monthly Departures",
+        },
+    ),
+    "domestic_heatmap": (
+        domestic_heatmap,
+        ["domestic"],
+        {"month": HEATMAP_MONTH, "title": "Domestic Traffic - December 2019"},
+    ),
+    "timewheels_domestic": (
+        timewheels,
+        ["domestic"],
+        {
+            "dataset": "domestic",
+            "cities": chart_timewheel_domestic.AUSTRALIAN_CITIES,
+            "years": TIMEWHEEL_YEARS,
+            "direction": "both",
+            "title": "Total Domestic Traffic",
+        },
+    ),
+}
+
+
+def aggregate_key(name: str, paths: dict) -> str:
+    """Get the cache key for an aggregate
+    The key covers the datasets it reads, its parameters and its source code
+
+    Arguments:
+        name {str} -- Name of the aggregate
+        paths {dict} -- Saved dataset for each dataset name
+
+    Returns:
+        str -- Cache key
+    """
+    func, uses, kwargs = AGGREGATES[name]
+    return chart_cache.cache_key(
+        [paths[dataset] for dataset in uses],
+        name,
+        kwargs,
+        chart_cache.source_key(func),
+    )
+
+
+def graph_key(name: str, paths: dict, dpi: int) -> str:
+    """Get the cache key for a rendered graph
+    The key covers the aggregate it is drawn from, the plotting and rendering code, and the image settings
+
+    Arguments:
+        name {str} -- Name of the graph
+        paths {dict} -- Saved dataset for each dataset name
+        dpi {int} -- Resolution of the saved graph
+
+    Returns:
+        str -- Cache key
+    """
+    plot, aggregate = GRAPHS[name]
+    return chart_cache.cache_key(
+        [],
+        aggregate_key(aggregate, paths),
+        chart_cache.source_key(plot, render_graph),
+        dpi,
+        FIGURE_SIZE,
+    )
+
+
+def init_worker():
+    """Setup a rendering process to draw off-screen"""
+    plt.switch_backend("Agg")
+
+
+def render_graph(name: str, plot, args: tuple, output: str, dpi: int) -> float:
+    """Draw a single graph and save it to file
+    Workers are reused, so the style is reset first to stop settings leaking between graphs
+
+    Arguments:
+        name {str} -- Name of the graph
+        plot {callable} -- Plotting function that returns a figure
+        args {tuple} -- Arguments for the plotting function
+        output {str} -- Directory to save the graph to
+        dpi {int} -- Resolution of the saved graph
+
+    Returns:
+        float -- Time taken to draw and save the graph, in seconds
+    """
+    start = time.perf_counter()
+    plt.rcdefaults()
+    with plt.rc_context({"figure.figsize": FIGURE_SIZE}):
+        fig = plot(*args)
+        fig.savefig(os.path.join(output, f"{name}.png"), dpi=dpi)
+    plt.close(fig)
+    return time.perf_counter() - start
+
+
+def render_graphs(
+    international: str,
+    domestic: str,
+    output: str,
+    names: list = None,
+    jobs: int = None,
+    dpi: int = 100,
+    cache_dir: str = chart_cache.DEFAULT_CACHE_DIR,
+    force: bool = False,
+    verbose: bool = False,
+) -> dict:
+    """Render every graph to file without opening any windows
+    Each aggregate is built once and shared between graphs, then cached as .npz
+    Graphs are only drawn if their inputs changed, in parallel worker processes
+
+    Arguments:
+        international {str} -- Saved international dataset
+        domestic {str} -- Saved domestic dataset
+        output {str} -- Directory to save the graphs to
+
+    Keyword Arguments:
+        names {list} -- Graphs to render. Defaults to every graph (default: {None})
+        jobs {int} -- Number of worker processes. Defaults to the number of CPUs (default: {None})
+        dpi {int} -- Resolution of the saved graphs (default: {100})
+        cache_dir {str} -- Directory for cached aggregates. Leave blank to disable the cache (default: {chart_cache.DEFAULT_CACHE_DIR})
+        force {bool} -- Render every graph, even if it is up to date (default: {False})
+        verbose {bool} -- Enable additional output logging (default: {False})
+
+    Returns:
+        dict -- Time taken to build each aggregate and draw each graph, and what was skipped
+    """
+    names = names if names else list(GRAPHS)
+    unknown = [name for name in names if name not in GRAPHS]
+    if unknown:
+        raise KeyError(f"Unknown graphs: {', '.join(unknown)}")
+    os.makedirs(output, exist_ok=True)
+
+    paths = {"international": international, "domestic": domestic}
+    timings = {"aggregates": {}, "graphs": {}, "cached": [], "skipped": []}
+
+    # Only draw graphs that are missing or were drawn from different inputs
+    manifest = chart_cache.load_manifest(cache_dir) if cache_dir else {}
+    keys = {name: graph_key(name, paths, dpi) for name in names}
+    images = {name: os.path.join(output, f"{name}.png") for name in names}
+    stale = [
+        name
+        for name in names
+        if force
+        or not cache_dir
+        or chart_cache.is_stale(manifest, images[name], keys[name])
+    ]
+    timings["skipped"] = [name for name in names if name not in stale]
+    if verbose:
+        for name in timings["skipped"]:
+            print(f"{name} is up to date")
+
+    # Build each aggregate once, even if several graphs use it
+    # Datasets are only opened if an aggregate isn't cached
+    aggregates = {}
+    for name in stale:
+        key = GRAPHS[name][1]
+        if key not in aggregates:
+            start = time.perf_counter()
+            func, _, kwargs = AGGREGATES[key]
+            aggregates[key], cached = chart_cache.cached_aggregate(
+                cache_dir, aggregate_key(key, paths), func, paths, **kwargs
+            )
+            timings["aggregates"][key] = time.perf_counter() - start
+            if cached:
+                timings["cached"].append(key)
+            if verbose:
+                source = "Loaded" if cached else "Built"
+                print(f"{source} {key} in {timings['aggregates'][key]:.2f}s")
+
+    if not stale:
+        return timings
+
+    # Graphs don't depend on each other, so draw them all at once
+    with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker) as executor:
+        futures = {
+            name: executor.submit(
+                render_graph,
+                name,
+                GRAPHS[name][0],
+                aggregates[GRAPHS[name][1]],
+                output,
+                dpi,
+            )
+            for name in stale
+        }
+        for name, future in futures.items():
+            timings["graphs"][name] = future.result()
+            manifest[os.path.abspath(images[name])] = keys[name]
+            if verbose:
+                print(f"Rendered {name} in {timings['graphs'][name]:.2f}s")
+
+    if cache_dir:
+        chart_cache.save_manifest(cache_dir, manifest)
+    return timings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Render every graph to file without opening any windows"
+    )
+    parser.add_argument(
+        "--international",
+        default="Visualization/international.nc",
+        help="International dataset. Defaults to 'Visualization/international.nc'",
+    )
+    parser.add_argument(
+        "--domestic",
+        default="Visualization/domestic.nc",
+        help="Domestic dataset. Defaults to 'Visualization/domestic.nc'",
+    )
+    parser.add_argument(
+        "--output",
+        default="Visualization/graphs",
+        help="Directory to save the graphs to. Defaults to 'Visualization/graphs'",
+    )
+    parser.add_argument(
+        "--only", nargs="*", choices=list(GRAPHS), help="Only render these graphs"
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        help="Number of worker processes. Defaults to the number of CPUs",
+    )
+    parser.add_argument(
+        "--dpi", type=int, default=100, help="Resolution of each graph. Defaults to 100"
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=chart_cache.DEFAULT_CACHE_DIR,
+        help=f"Directory for cached aggregates. Defaults to '{chart_cache.DEFAULT_CACHE_DIR}'",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="Always build and render everything"
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Render every graph, even if its inputs haven't changed",
+    )
+    parser.add_argument(
+        "--timings", help="Output JSON file for the timings. Leave blank to skip."
+    )
+    parser.add_argument(
+        "--verbose", action="store_true", help="Enable additional output logging"
+    )
+    args = parser.parse_args()
+
+    timings = render_graphs(
+        args.international,
+        args.domestic,
+        args.output,
+        names=args.only,
+        jobs=args.jobs,
+        dpi=args.dpi,
+        cache_dir=None if args.no_cache else args.cache_dir,
+        force=args.force,
+        verbose=args.verbose,
+    )
+
+    # Summary of where the time went
+    for key, seconds in timings["aggregates"].items():
+        cached = " (cached)" if key in timings["cached"] else ""
+        print(f"{key:<28}{seconds:>8.2f}s{cached}")
+    for name, seconds in timings["graphs"].items():
+        print(f"{name:<28}{seconds:>8.2f}s")
+    for name in timings["skipped"]:
+        print(f"{name:<28}{'up to date':>9}")
+
+    if args.timings:
+        with open(args.timings, "w") as f:
+            json.dump(timings, f, indent=2)
@@ -0,0 +1,171 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+from scipy.ndimage import correlate1d
+
+import util
+
+# Monthly data repeats every year
+PERIOD = 12
+
+
+def moving_average(values: np.ndarray, period: int = PERIOD) -> np.ndarray:
+    """Get the centred moving average of every series at once
+    Even periods use a 2 x period average, so the window stays centred
+    Points without a full window of data are NaN
+
+    Arguments:
+        values {np.ndarray} -- Evenly spaced series, with time as the last axis
+
+    Keyword Arguments:
+        period {int} -- Length of the seasonal cycle (default: {PERIOD})
+
+    Returns:
+        np.ndarray -- Trend, with the same shape as values
+    """
+    if period % 2 == 0:
+        weights = np.r_[0.5, np.ones(period - 1), 0.5] / period
+    else:
+        weights = np.ones(period) / period
+
+    # Any window with a missing month is thrown away
+    present = ~np.isnan(values)
+    total = correlate1d(
+        np.where(present, values, 0.0), weights, axis=-1, mode="constant"
+    )
+    full = correlate1d(present.astype(np.float64), weights, axis=-1, mode="constant")
+    return np.where(np.isclose(full, 1.0), total, np.nan)
+
+
+def decompose(values: np.ndarray, calendar: np.ndarray, period: int = PERIOD) -> tuple:
+    """Split every series into trend, seasonal and residual parts at once
+    The trend is a centred moving average, and the seasonal part is the mean of the
+    detrended series for each position in the cycle, adjusted to sum to zero
+
+    Arguments:
+        values {np.ndarray} -- Evenly spaced series, with time as the last axis
+        calendar {np.ndarray} -- Position of each sample in the cycle, from 0 to period - 1
+
+    Keyword Arguments:
+        period {int} -- Length of the seasonal cycle (default: {PERIOD})
+
+    Returns:
+        tuple -- Trend, seasonal and residual arrays, with the same shape as values
+    """
+    values = np.asarray(values, dtype=np.float64)
+    trend = moving_average(values, period)
+    detrended = values - trend
+
+    # Average each calendar month across every year, then centre the cycle on zero
+    one_hot = calendar[:, None] == np.arange(period)
+    present = ~np.isnan(detrended)
+    totals = np.where(present, detrended, 0.0) @ one_hot
+    counts = present.astype(np.float64) @ one_hot
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = totals / counts
+        known = ~np.isnan(means)
+        offset = np.where(known, means, 0.0).sum(axis=-1, keepdims=True)
+        means -= offset / known.sum(axis=-1, keepdims=True)
+
+    seasonal = np.take(means, calendar, axis=-1)
+    residual = values - trend - seasonal
+    return trend, seasonal, residual
+
+
+def decompose_dataset(
+    ds: xr.Dataset, variables: list = None, period: int = PERIOD
+) -> xr.Dataset:
+    """Add trend, seasonal and residual variables for every series in a dataset
+    Every route is decomposed in a single pass over the whole array
+    The Month axis is filled out to every month, so the moving average is evenly spaced
+
+    Arguments:
+        ds {xr.Dataset} -- Dense dataset
+
+    Keyword Arguments:
+        variables {list} -- Count variables to decompose. Defaults to every count variable (default: {None})
+        period {int} -- Length of the seasonal cycle, in months (default: {PERIOD})
+
+    Returns:
+        xr.Dataset -- Dataset with <variable>_trend, <variable>_seasonal and <variable>_residual added
+    """
+    if variables is None:
+        variables = [v for v in util.COUNT_COLUMNS if v in ds.data_vars]
+
+    months = ds.coords["Month"].values
+    ds = ds.reindex(Month=pd.date_range(months.min(), months.max(), freq="MS"))
+    # Months are evenly spaced now, so each one's position in the cycle follows from its index
+    calendar = np.arange(ds.sizes["Month"]) % period
+
+    components = {}
+    for variable in variables:
+        counts = ds[variable]
+        dims = [d for d in counts.dims if d != "Month"] + ["Month"]
+        counts = counts.transpose(*dims)
+
+        parts = decompose(counts.values, calendar, period)
+        for name, part in zip(("trend", "seasonal", "residual"), parts):
+            components[f"{variable}_{name}"] = (dims, part)
+
+    return ds.assign(components)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Split the monthly traffic on every route into trend, seasonal and residual parts"
+    )
+    parser.add_argument("input", help="Input dataset")
+    parser.add_argument("--output", required=True, help="Output dataset")
+    parser.add_argument(
+        "--variables",
+        nargs="*",
+        help="Count variables to decompose. Defaults to every count variable",
+    )
+    parser.add_argument(
+        "--period",
+        type=int,
+        default=PERIOD,
+        help=f"Length of the seasonal cycle in months. Defaults to {PERIOD}",
+    )
+    parser.add_argument(
+        "--format",
+        choices=["netcdf", "zarr"],
+        default="netcdf",
+        help="Output format. Defaults to 'netcdf'",
+    )
+    args = parser.parse_args()
+
+    combined = util.load_cdf(args.input).load()
+    combined = decompose_dataset(combined, args.variables, args.period)
+
+    # Store the output the same way as the input, and keep its pre-computed totals
+    settings = util.storage_settings(args.input)
+    try:
+        rollups = util.load_rollups(args.input).load()
+    except OSError:
+        rollups = None
+    saved = util.encode_categories(combined) if settings["compact"] else combined
+
+    # Write to a temporary file first, so the input can be overwritten safely
+    temp_output = f"{args.output}.tmp"
+    util.save_cdf(
+        saved,
+        temp_output,
+        args.format,
+        util.output_encoding(saved, format=args.format, **settings),
+    )
+    if rollups is not None:
+        util.save_cdf(
+            rollups,
+            temp_output,
+            args.format,
+            util.output_encoding(rollups, format=args.format),
+            group=util.ROLLUP_GROUP,
+        )
+    if args.format == "zarr":
+        util.zarr.consolidate_metadata(temp_output)
+    util.remove_cdf(args.output)
+    os.replace(temp_output, args.output)
@@ -0,0 +1,145 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+from scipy.fft import rfft, rfftfreq
+from scipy.signal import detrend
+
+import query
+import util
+
+# Samples are one month apart, so frequencies come out in cycles per year
+MONTHS_PER_YEAR = 12
+
+
+def port_matrix(ds: xr.Dataset, directions: tuple = ("in", "out")) -> xr.DataArray:
+    """Get the monthly traffic through every port in every direction as one array
+    Gaps in the Month axis are filled so the samples are evenly spaced
+
+    Arguments:
+        ds {xr.Dataset} -- Dense dataset
+
+    Keyword Arguments:
+        directions {tuple} -- Directions to include, as in query.port_series (default: {("in", "out")})
+
+    Returns:
+        xr.DataArray -- Total passengers with dimensions (Port, Direction, Month)
+    """
+    dims = query.port_dims(ds)
+    if dims[0] == "AustralianPort":
+        # Foreign ports are only ever the other end of a route
+        ports = [str(port) for port in ds.coords[dims[0]].values]
+    else:
+        # Domestic airports can show up as either an origin or a destination
+        ports = sorted(set(ds.coords[dims[0]].values) | set(ds.coords[dims[1]].values))
+
+    months = pd.date_range(
+        ds.coords["Month"].values.min(), ds.coords["Month"].values.max(), freq="MS"
+    )
+
+    totals = []
+    for direction in directions:
+        total = 0
+        for variable, position in query.DIRECTIONS[dims[0]][direction]:
+            dim = dims[position]
+            others = [d for d in ds[variable].dims if d not in (dim, "Month")]
+            total = total + (
+                ds[variable]
+                .sum(others)
+                .rename({dim: "Port"})
+                .reindex(Port=ports, Month=months, fill_value=0)
+            )
+        totals.append(total.transpose("Port", "Month"))
+
+    return xr.concat(
+        totals, dim=pd.Index(list(directions), name="Direction")
+    ).transpose("Port", "Direction", "Month")
+
+
+def spectrum(values: np.ndarray) -> tuple:
+    """Get the single-sided amplitude spectrum of every series at once
+    Each series is evenly spaced monthly data along the last axis
+    A straight line is fitted and removed from each series first, so long-term growth doesn't hide the cycles
+
+    Arguments:
+        values {np.ndarray} -- Monthly series, with Month as the last axis
+
+    Returns:
+        tuple -- Frequencies in cycles per year, and amplitudes with the same leading axes as values
+    """
+    values = np.nan_to_num(np.asarray(values, dtype=np.float64))
+    n = values.shape[-1]
+
+    # Remove the mean and any trend, so these don't leak into the lowest frequencies
+    values = detrend(values, axis=-1)
+    amplitudes = 2.0 / n * np.abs(rfft(values, axis=-1))
+    frequencies = rfftfreq(n, d=1.0 / MONTHS_PER_YEAR)
+    return frequencies, amplitudes
+
+
+def dominant_periods(matrix: xr.DataArray, top: int = 3) -> pd.DataFrame:
+    """Get the strongest cycles in every series of a port matrix
+
+    Arguments:
+        matrix {xr.DataArray} -- Monthly traffic from port_matrix
+
+    Keyword Arguments:
+        top {int} -- Number of cycles for each series (default: {3})
+
+    Returns:
+        pd.DataFrame -- Period in months, frequency in cycles per year and amplitude of each cycle
+    """
+    frequencies, amplitudes = spectrum(matrix.values)
+
+    # Skip the constant term, then sort each series by amplitude
+    amplitudes = amplitudes[..., 1:]
+    frequencies = frequencies[1:]
+    order = np.argsort(-amplitudes, axis=-1, kind="stable")[..., :top]
+    strongest = np.take_along_axis(amplitudes, order, axis=-1)
+
+    ports, directions, ranks = np.meshgrid(
+        matrix.coords["Port"].values,
+        matrix.coords["Direction"].values,
+        np.arange(1, order.shape[-1] + 1),
+        indexing="ij",
+    )
+    return pd.DataFrame(
+        {
+            "Port": ports.ravel(),
+            "Direction": directions.ravel(),
+            "Rank": ranks.ravel(),
+            "PeriodMonths": MONTHS_PER_YEAR / frequencies[order].ravel(),
+            "CyclesPerYear": frequencies[order].ravel(),
+            "Amplitude": strongest.ravel(),
+        }
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Find the strongest cycles in the monthly traffic through every port"
+    )
+    parser.add_argument(
+        "--input",
+        default="Visualization/international.nc",
+        help="Input dataset. Defaults to 'Visualization/international.nc'",
+    )
+    parser.add_argument(
+        "--top",
+        type=int,
+        default=3,
+        help="Number of cycles for each port and direction. Defaults to 3",
+    )
+    parser.add_argument(
+        "--output", help="Output CSV file. Leave blank to print the table."
+    )
+    args = parser.parse_args()
+
+    matrix = port_matrix(util.load_cdf(args.input))
+    table = dominant_periods(matrix, top=args.top)
+
+    if args.output:
+        table.to_csv(args.output, index=False)
+    else:
+        print(table.to_string(index=False))
@@ -0,0 +1,99 @@
+import calendar
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+import query
+
+MONTHS = [x for x in range(1, 13)]
+
+
+def timewheel_tensor(
+    ds: xr.Dataset, ports: list, years: list, direction: str = "in"
+) -> np.ndarray:
+    """Get the monthly traffic through each port as a (port, year, month) array
+    Every total is summed once over the whole Month axis, then reshaped into years
+    Months and ports missing from the dataset are left as zero
+
+    Arguments:
+        ds {xr.Dataset} -- Dense dataset
+        ports {list} -- Australian ports or domestic airports
+        years {list} -- Consecutive years to include
+
+    Keyword Arguments:
+        direction {str} -- Either "in", "out" or "both", as in query.port_series (default: {"in"})
+
+    Returns:
+        np.ndarray -- Total passengers with shape (len(ports), len(years), 12)
+    """
+    dims = query.port_dims(ds)
+    if direction not in query.DIRECTIONS[dims[0]]:
+        raise ValueError(f"Unknown direction: {direction}")
+
+    # Every month of every year, in order, so the reshape lines up
+    months = pd.date_range(f"{years[0]}-01-01", periods=len(years) * 12, freq="MS")
+
+    data = np.zeros((len(ports), len(months)))
+    for variable, position in query.DIRECTIONS[dims[0]][direction]:
+        dim = dims[position]
+        others = [d for d in ds[variable].dims if d not in (dim, "Month")]
+        totals = (
+            ds[variable]
+            .sum(others)
+            .reindex({dim: ports, "Month": months}, fill_value=0)
+            .transpose(dim, "Month")
+        )
+        data += totals.values
+
+    return data.reshape(len(ports), len(years), len(MONTHS))
+
+
+def plot_timewheels(data: np.ndarray, ports: list, years: list, title: str):
+    """Draw a polar heatmap for each port on a 2x3 grid
+    Each ring is a year, and each segment is a month
+
+    Arguments:
+        data {np.ndarray} -- Traffic from timewheel_tensor
+        ports {list} -- Port names, in the same order as data
+        years {list} -- Years, in the same order as data
+        title {str} -- Title suffix for each chart, eg. "Total Monthly Arrivals"
+
+    Returns:
+        matplotlib.figure.Figure -- Figure holding the charts
+    """
+    # Setup the subplots
+    # Use polar coordinates because I'm a cool dude
+    fig, axs = plt.subplots(
+        2, 3, constrained_layout=True, subplot_kw={"projection": "polar"}
+    )
+    plt.rcParams.update({"font.size": 14})
+
+    # Draw each dataset
+    for pos, ax in np.ndenumerate(axs):
+        i = pos[0] * 3 + pos[1]
+        ax.set_theta_zero_location("N")
+        ax.set_theta_direction(-1)
+
+        # Plot the data
+        theta = np.linspace(0, 2 * np.pi, len(MONTHS) + 1)
+        r = np.arange(len(years) + 1)
+        cout = ax.pcolormesh(theta, r, data[i], cmap="plasma")
+
+        # Change the labels
+        pos, step = np.linspace(0, 2 * np.pi, len(MONTHS), endpoint=False, retstep=True)
+        pos += step / 2
+        ax.set_xticks(pos)
+        ax.set_xticklabels([calendar.month_name[i] for i in MONTHS], fontsize=12)
+
+        # Only show every 2nd year to stop this chart looking atrocious
+        ax.set_yticks(np.arange(len(years)))
+        ax.set_yticklabels(years, fontsize=10)
+        for label in ax.get_yticklabels()[::2]:
+            label.set_visible(False)
+
+        ax.set_title(f"{ports[i]} - {title}")
+        fig.colorbar(cout, ax=ax)
+
+    return fig
@@ -1,7 +1,41 @@
 import argparse
+import contextlib
+import functools
+import glob
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+import tracemalloc
+from concurrent.futures import Executor, ProcessPoolExecutor
+
+import numpy as np
 import pandas as pd
 import xarray as xr
 
+try:
+    import resource
+except ImportError:
+    resource = None
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+try:
+    import numcodecs
+    import zarr
+except ImportError:
+    zarr = None
+
 DEFAULT_FILENAMES = [
     "CityPairs_85to88.xls",
     "CityPairs_89to93.xls",
@@ -22,6 +56,1014 @@ DEFAULT_COLUMNS = [
 
 DEFAULT_INDEX = ["AustralianPort", "ForeignPort", "Month"]
 
+DEFAULT_CACHE_DIR = ".excel_cache"
+
+# Bump this whenever the cleaning of cached frames changes, so older entries are never reused
+CACHE_VERSION = 1
+
+DEFAULT_BATCH_SIZE = 50000
+
+# Marker used in place of counts that are withheld from the published data
+SUPPRESSED_VALUE = "Data not available for release."
+
+# netCDF group holding the pre-computed totals
+ROLLUP_GROUP = "rollups"
+
+# Zarr stores use the version 2 layout, which every zarr release can read
+ZARR_FORMAT = 2
+
+# Dimensions that ports can be selected on in load_cdf, in order of preference
+PORT_DIMS = ["AustralianPort", "Origin"]
+
+# Columns that are compacted when compact dtypes are requested
+COUNT_COLUMNS = ["PaxIn", "PaxOut", "Passengers", "Trips"]
+LABEL_COLUMNS = ["AustralianPort", "ForeignPort", "Origin", "Destination", "Country"]
+
+
+def track_memory() -> bool:
+    """Start tracking memory use where the peak resident memory can't be read, eg. on Windows
+    Tracing slows processing down several times over, so only do this while profiling
+
+    Returns:
+        bool -- True if tracing was started here, and should be stopped by the caller
+    """
+    if resource or tracemalloc.is_tracing():
+        return False
+    tracemalloc.start()
+    return True
+
+
+def peak_rss() -> int:
+    """Get the peak resident memory of this process so far
+    Without the resource module, this is the peak traced since track_memory was called
+
+    Returns:
+        int -- Peak memory in bytes, or None if it isn't being tracked
+    """
+    if resource:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS reports this in bytes, while Linux and the BSDs use kilobytes
+        return peak if sys.platform == "darwin" else peak * 1024
+    if tracemalloc.is_tracing():
+        return tracemalloc.get_traced_memory()[1]
+    return None
+
+
+@contextlib.contextmanager
+def profile_stage(profile: list, stage: str, rows_in: int = None, **details):
+    """Time a stage of the processing and record it in the profile
+    The yielded record can be updated with rows_out and any other details
+
+    Arguments:
+        profile {list} -- List of stage records to add to. None disables profiling
+        stage {str} -- Name of the stage
+
+    Keyword Arguments:
+        rows_in {int} -- Number of rows going into the stage (default: {None})
+
+    Yields:
+        dict -- Record for this stage
+    """
+    record = {"stage": stage, **details, "rows_in": rows_in, "rows_out": rows_in}
+    if profile is None:
+        yield record
+        return
+
+    start = time.perf_counter()
+    yield record
+    record["seconds"] = time.perf_counter() - start
+    record["peak_rss"] = peak_rss()
+    record["pid"] = os.getpid()
+    profile.append(record)
+
+
+def cache_path(
+    file: str,
+    columns: list,
+    sheet: str,
+    mergedate: bool,
+    cache_dir: str,
+    compact: bool = False,
+) -> str:
+    """Get the cache filename for a parsed spreadsheet
+    The key changes whenever the spreadsheet is modified or parsed differently
+
+    Arguments:
+        file {str} -- Excel spreadsheet file
+        columns {list} -- List of columns included in the parsed frame
+        sheet {str} -- Sheet the data was read from
+        mergedate {bool} -- Whether the Year and Month columns were combined
+        cache_dir {str} -- Directory holding the cached frames
+
+    Keyword Arguments:
+        compact {bool} -- Whether the frame uses compact dtypes (default: {False})
+
+    Returns:
+        str -- Path to the cached frame
+    """
+    stat = os.stat(file)
+    key = json.dumps(
+        [
+            CACHE_VERSION,
+            os.path.abspath(file),
+            stat.st_size,
+            stat.st_mtime_ns,
+            sheet,
+            list(columns),
+            mergedate,
+            compact,
+        ]
+    )
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, f"{digest}.feather")
+
+
+def is_cached(path: str) -> bool:
+    """Check if a cached frame can be used
+    Validation results are cached alongside the frame, so both are needed
+
+    Arguments:
+        path {str} -- Path to the cached frame, from cache_path
+
+    Returns:
+        bool -- True if the frame and its validation results are both cached
+    """
+    return os.path.exists(path) and os.path.exists(f"{path[: -len('.feather')]}.json")
+
+
+def clear_cache(cache_dir: str = DEFAULT_CACHE_DIR) -> int:
+    """Remove every cached frame from the cache directory
+
+    Keyword Arguments:
+        cache_dir {str} -- Directory holding the cached frames (default: {DEFAULT_CACHE_DIR})
+
+    Returns:
+        int -- Number of cached frames removed
+    """
+    removed = 0
+    for path in glob.glob(os.path.join(cache_dir, "*.feather")):
+        os.remove(path)
+        if not path.endswith(".rejected.feather"):
+            removed += 1
+    for path in glob.glob(os.path.join(cache_dir, "*.json")):
+        os.remove(path)
+    return removed
+
+
+def compact_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """Shrink a sanitised frame to compact dtypes
+    Passenger counts become the smallest integer type that fits, and port names become categoricals
+
+    Arguments:
+        df {pd.DataFrame} -- Sanitised frame
+
+    Returns:
+        pd.DataFrame -- Frame using compact dtypes
+    """
+    df = df.copy()
+    for column in df.columns:
+        if column in COUNT_COLUMNS:
+            df[column] = pd.to_numeric(df[column], errors="coerce")
+            if not df[column].isna().any():
+                df[column] = pd.to_numeric(df[column], downcast="integer")
+        elif column in LABEL_COLUMNS:
+            df[column] = df[column].astype("category")
+    return df
+
+
+def unify_categories(frames: list) -> list:
+    """Give matching categorical columns the same categories across frames
+    Without this, concatenating the frames falls back to plain object columns
+
+    Arguments:
+        frames {list} -- List of frames to be concatenated
+
+    Returns:
+        list -- Frames with shared categories
+    """
+    if not frames:
+        return frames
+
+    columns = [
+        column
+        for column in frames[0].columns
+        if isinstance(frames[0][column].dtype, pd.CategoricalDtype)
+    ]
+    for column in columns:
+        categories = sorted(
+            set().union(
+                *(frame[column].cat.categories for frame in frames if column in frame)
+            )
+        )
+        frames = [
+            frame.assign(**{column: frame[column].cat.set_categories(categories)})
+            for frame in frames
+        ]
+    return frames
+
+
+def encode_categories(ds: xr.Dataset) -> xr.Dataset:
+    """Replace string data variables with integer codes and a lookup table
+    Each encoded variable gets a matching '<name>_categories' lookup variable
+
+    Arguments:
+        ds {xr.Dataset} -- Dataset to encode
+
+    Returns:
+        xr.Dataset -- Dataset with integer coded string variables
+    """
+    for name in list(ds.data_vars):
+        variable = ds[name]
+        if variable.dtype.kind not in "OUS":
+            continue
+
+        codes, uniques = pd.factorize(variable.values.ravel(), sort=True)
+        dtype = np.int16 if len(uniques) < np.iinfo(np.int16).max else np.int32
+        lookup = f"{name}_categories"
+        ds = ds.assign(
+            {
+                name: (
+                    variable.dims,
+                    codes.reshape(variable.shape).astype(dtype),
+                    {"categories": lookup},
+                ),
+                lookup: (lookup, np.asarray(uniques, dtype=str)),
+            }
+        )
+    return ds
+
+
+def decode_codes(codes: np.ndarray, labels: np.ndarray) -> np.ndarray:
+    """Look up the label for each integer code
+    Missing values (code -1, or NaN once expanded into a dense cube) become NaN
+
+    Arguments:
+        codes {np.ndarray} -- Integer codes
+        labels {np.ndarray} -- Label for each code
+
+    Returns:
+        np.ndarray -- Labels, with the same shape as codes
+    """
+    present = codes >= 0
+    return np.where(
+        present, labels[np.where(present, codes, 0).astype(np.intp)], np.nan
+    )
+
+
+def decode_categories(ds: xr.Dataset) -> xr.Dataset:
+    """Restore string data variables stored with encode_categories
+    Missing values (code -1) are restored as NaN
+    Chunked datasets stay lazy, and are only decoded one chunk at a time when computed
+
+    Arguments:
+        ds {xr.Dataset} -- Dataset to decode
+
+    Returns:
+        xr.Dataset -- Dataset with string variables restored
+    """
+    for name in list(ds.data_vars):
+        lookup = ds[name].attrs.get("categories")
+        if not lookup or lookup not in ds:
+            continue
+
+        # Only the lookup table is read here, the codes are decoded lazily
+        labels = ds[lookup].values.astype(object)
+        values = xr.apply_ufunc(
+            functools.partial(decode_codes, labels=labels),
+            ds[name],
+            dask="parallelized",
+            output_dtypes=[object],
+            keep_attrs=False,
+        )
+        ds = ds.assign({name: values}).drop_vars(lookup)
+    return ds
+
+
+def validate_counts(df: pd.DataFrame) -> tuple:
+    """Coerce the passenger count columns to numbers, tracking each kind of bad value
+    '..' placeholders are small suppressed counts, so these become 0
+    Rows with counts that are not available for release, or can't be read as numbers, are rejected
+
+    Arguments:
+        df {pd.DataFrame} -- Frame with the requested columns
+
+    Returns:
+        tuple -- Valid rows, rejected rows with a reason column, and a dict of counts for each kind of bad value
+    """
+    counts = {"placeholder": 0, "suppressed": 0, "invalid": 0}
+    reasons = pd.Series(None, index=df.index, dtype=object)
+    values = {}
+
+    for column in df.columns:
+        if column not in COUNT_COLUMNS or pd.api.types.is_numeric_dtype(df[column]):
+            continue
+
+        numbers = pd.to_numeric(df[column], errors="coerce")
+        failed = numbers.isna() & df[column].notna()
+        if failed.any():
+            # Only the values that failed to convert need string handling
+            text = df[column][failed].astype(str).str.strip()
+            placeholder = text.index[text == ".."]
+            suppressed = text.index[text == SUPPRESSED_VALUE]
+            invalid = text.index[(text != "..") & (text != SUPPRESSED_VALUE)]
+
+            numbers.loc[placeholder] = 0
+            reasons.loc[suppressed] = reasons.loc[suppressed].fillna(
+                f"{column} suppressed"
+            )
+            reasons.loc[invalid] = reasons.loc[invalid].fillna(f"{column} invalid")
+
+            counts["placeholder"] += len(placeholder)
+            counts["suppressed"] += len(suppressed)
+            counts["invalid"] += len(invalid)
+        values[column] = numbers
+
+    rejected_mask = reasons.notna()
+    rejected = df[rejected_mask].assign(reason=reasons[rejected_mask])
+    df = df[~rejected_mask].assign(**{k: v[~rejected_mask] for k, v in values.items()})
+
+    # Whole numbers are kept as integers, like they would be without any bad values or blank rows
+    for column in df.columns:
+        numbers = df[column]
+        if column not in COUNT_COLUMNS or numbers.dtype.kind != "f":
+            continue
+        if not numbers.isna().any() and (numbers == numbers.round()).all():
+            df[column] = numbers.astype(np.int64)
+
+    return df, rejected, counts
+
+
+def sanitise_frame(
+    df: pd.DataFrame,
+    columns: list,
+    mergedate: bool = False,
+    profile: list = None,
+    file: str = None,
+    validation: dict = None,
+) -> pd.DataFrame:
+    """Apply the basic date merging, column stripping and sanitising to a raw frame
+
+    Arguments:
+        df {pd.DataFrame} -- Raw frame read from a spreadsheet
+        columns {list} -- List of columns to include in the resulting frame
+
+    Keyword Arguments:
+        mergedate {bool} -- Combine the Year and Month columns into a single date (default: {False})
+        profile {list} -- If given, stage timings are added to this list (default: {None})
+        file {str} -- Spreadsheet the frame came from, used when profiling (default: {None})
+        validation {dict} -- If given, bad value counts and rejected rows are added to this (default: {None})
+
+    Returns:
+        pd.DataFrame -- Sanitised frame
+    """
+    # Date combining if required
+    if mergedate:
+        with profile_stage(profile, "date_merge", len(df.index), file=file):
+            df["Month"] = pd.to_datetime(df[["Year", "Month"]].assign(DAY=1))
+
+    # Strip columns as needed
+    # pd.read_excel keeps blank rows as all-NaN rows, so drop these along with the unused columns
+    with profile_stage(profile, "projection", len(df.index), file=file) as record:
+        df = df[columns].dropna(how="all")
+        record["rows_out"] = len(df.index)
+
+    # Basic sanitising
+    with profile_stage(profile, "validate", len(df.index), file=file) as record:
+        df, rejected, counts = validate_counts(df)
+        record["rows_out"] = len(df.index)
+        record.update(counts)
+
+    if validation is not None:
+        for kind, count in counts.items():
+            validation["counts"][kind] = validation["counts"].get(kind, 0) + count
+        if len(rejected.index):
+            validation["rejected"].append(rejected)
+
+    return df
+
+
+def stream_excel(
+    file: str,
+    columns: list,
+    sheet: str = "Data",
+    mergedate: bool = False,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    validation: dict = None,
+) -> pd.DataFrame:
+    """Load and sanitise an .xlsx spreadsheet one batch of rows at a time
+    Only the requested columns are ever kept, so memory is bounded by the batch size rather than the sheet width
+
+    Arguments:
+        file {str} -- Excel .xlsx spreadsheet file to process
+        columns {list} -- List of columns to include in the resulting frame
+
+    Keyword Arguments:
+        sheet {str} -- Sheet in the spreadsheet containing the data (default: {"Data"})
+        mergedate {bool} -- Combine the Year and Month columns into a single date (default: {False})
+        batch_size {int} -- Number of rows to sanitise at once (default: {DEFAULT_BATCH_SIZE})
+        validation {dict} -- If given, bad value counts and rejected rows are added to this (default: {None})
+
+    Returns:
+        pd.DataFrame -- Sanitised data from the spreadsheet
+    """
+    if not openpyxl:
+        raise ImportError("openpyxl is required to stream .xlsx spreadsheets")
+
+    workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook[sheet].iter_rows(values_only=True)
+        header = list(next(rows))
+
+        # Only pull the columns we need out of each row
+        needed = list(columns)
+        if mergedate:
+            needed += [column for column in ("Year", "Month") if column not in needed]
+        missing = [column for column in needed if column not in header]
+        if missing:
+            raise KeyError(f"Columns {missing} not found in {file}")
+        positions = [header.index(column) for column in needed]
+
+        data = []
+        batch = []
+        for row in rows:
+            # Skip fully blank rows early, sanitise_frame would drop these anyway
+            if all(value is None for value in row):
+                continue
+
+            batch.append([row[i] if i < len(row) else None for i in positions])
+            if len(batch) >= batch_size:
+                frame = pd.DataFrame(batch, columns=needed)
+                data.append(
+                    sanitise_frame(frame, columns, mergedate, validation=validation)
+                )
+                batch = []
+
+        if batch or not data:
+            frame = pd.DataFrame(batch, columns=needed)
+            data.append(
+                sanitise_frame(frame, columns, mergedate, validation=validation)
+            )
+    finally:
+        workbook.close()
+
+    # Batches are typed separately, so let pandas settle on a type for the whole column
+    return pd.concat(data, ignore_index=True).infer_objects()
+
+
+def load_excel(
+    file: str,
+    columns: list,
+    sheet: str = "Data",
+    mergedate: bool = False,
+    cache_dir: str = None,
+    compact: bool = False,
+    stream: bool = False,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    profile: list = None,
+    validation: dict = None,
+) -> pd.DataFrame:
+    """Load and sanitise a single excel spreadsheet
+    This is kept at the module level so it can be handed off to worker processes
+    If a cache directory is given, the sanitised frame is stored as Feather and reused
+
+    Arguments:
+        file {str} -- Excel spreadsheet file to process
+        columns {list} -- List of columns to include in the resulting frame
+
+    Keyword Arguments:
+        sheet {str} -- Sheet in the spreadsheet containing the data (default: {"Data"})
+        mergedate {bool} -- Combine the Year and Month columns into a single date (default: {False})
+        cache_dir {str} -- Directory to cache parsed frames in. None disables caching (default: {None})
+        compact {bool} -- Convert the frame to compact dtypes (default: {False})
+        stream {bool} -- Read .xlsx spreadsheets in batches of rows to bound memory (default: {False})
+        batch_size {int} -- Number of rows per batch when streaming (default: {DEFAULT_BATCH_SIZE})
+        profile {list} -- If given, stage timings are added to this list (default: {None})
+        validation {dict} -- If given, bad value counts and rejected rows are added to this (default: {None})
+
+    Returns:
+        pd.DataFrame -- Sanitised data from the spreadsheet
+    """
+    if validation is None:
+        validation = {"counts": {}, "rejected": []}
+
+    if cache_dir and pyarrow:
+        path = cache_path(file, columns, sheet, mergedate, cache_dir, compact)
+        base = path[: -len(".feather")]
+        if is_cached(path):
+            with profile_stage(profile, "read", file=file, cached=True) as record:
+                df = pd.read_feather(path)
+                record["rows_out"] = len(df.index)
+
+            with open(f"{base}.json") as f:
+                validation["counts"].update(json.load(f))
+            if os.path.exists(f"{base}.rejected.feather"):
+                validation["rejected"].append(
+                    pd.read_feather(f"{base}.rejected.feather")
+                )
+            return df
+
+    # Older .xls spreadsheets can't be streamed, so always read these in full
+    # Streaming sanitises as it reads, so its stages are all timed as part of the read
+    if stream and file.lower().endswith(".xlsx"):
+        with profile_stage(profile, "read", file=file, streamed=True) as record:
+            df = stream_excel(file, columns, sheet, mergedate, batch_size, validation)
+            record["rows_out"] = len(df.index)
+    else:
+        with profile_stage(profile, "read", file=file) as record:
+            df = pd.read_excel(file, sheet_name=sheet)
+            record["rows_out"] = len(df.index)
+        df = sanitise_frame(df, columns, mergedate, profile, file, validation)
+
+    # Rejected rows can hold any mix of types, so keep them as text for the quarantine file
+    validation["rejected"] = [
+        rejected.assign(file=file).astype(str) for rejected in validation["rejected"]
+    ]
+
+    if compact:
+        with profile_stage(profile, "compact", len(df.index), file=file):
+            df = compact_dtypes(df)
+
+    if cache_dir and pyarrow:
+        # Feather needs a default index and consistently typed columns
+        # Normalise here so cache hits and misses give the same frame
+        df = df.reset_index(drop=True).infer_objects()
+        os.makedirs(cache_dir, exist_ok=True)
+
+        # Write to a temporary file first so other workers never see a partial frame
+        # The frame goes last, so a cache hit always has its validation results
+        with open(f"{base}.json", "w") as f:
+            json.dump(validation["counts"], f)
+        if validation["rejected"]:
+            temp_path = f"{base}.rejected.{os.getpid()}.tmp"
+            pd.concat(validation["rejected"], ignore_index=True).to_feather(temp_path)
+            os.replace(temp_path, f"{base}.rejected.feather")
+        elif os.path.exists(f"{base}.rejected.feather"):
+            os.remove(f"{base}.rejected.feather")
+
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        df.to_feather(temp_path)
+        os.replace(temp_path, path)
+
+    return df
+
+
+def load_excel_report(file: str, profile: bool = False, **kwargs) -> tuple:
+    """Load a single excel spreadsheet while recording validation results, and stage timings if profiling
+    Worker processes can't add to the parent's lists, so these are returned with the frame
+
+    Arguments:
+        file {str} -- Excel spreadsheet file to process
+
+    Keyword Arguments:
+        profile {bool} -- Record the time and memory of each stage (default: {False})
+
+    Returns:
+        tuple -- Sanitised data from the spreadsheet, the list of stage records, and the validation results
+    """
+    records = [] if profile else None
+    validation = {"counts": {}, "rejected": []}
+
+    tracing = track_memory() if profile else False
+    try:
+        df = load_excel(file, profile=records, validation=validation, **kwargs)
+    finally:
+        if tracing:
+            tracemalloc.stop()
+    return df, records if profile else [], validation
+
+
+def to_sparse(df: pd.DataFrame, index: list) -> xr.Dataset:
+    """Convert a frame into a sparse coordinate-list dataset
+    Each row is stored once along a 'record' dimension, with integer codes into the sorted index coordinates
+
+    Arguments:
+        df {pd.DataFrame} -- Frame to convert
+        index {list} -- Ordered list of columns to index the data with
+
+    Returns:
+        xr.Dataset -- Sparse dataset
+    """
+    coords = {}
+    data_vars = {}
+    for column in index:
+        codes, uniques = pd.factorize(df[column], sort=True)
+        coords[column] = np.asarray(uniques)
+        data_vars[f"{column}_code"] = ("record", codes.astype(np.int32))
+
+    for column in df.columns:
+        if column not in index:
+            data_vars[column] = ("record", df[column].to_numpy())
+
+    return xr.Dataset(
+        data_vars, coords=coords, attrs={"layout": "sparse", "index": ",".join(index)}
+    )
+
+
+def is_sparse(ds: xr.Dataset) -> bool:
+    """Check if a dataset uses the sparse coordinate-list layout
+
+    Arguments:
+        ds {xr.Dataset} -- Dataset to check
+
+    Returns:
+        bool -- True if the dataset is sparse
+    """
+    return ds.attrs.get("layout") == "sparse"
+
+
+def sparse_to_frame(ds: xr.Dataset) -> pd.DataFrame:
+    """Convert a sparse dataset back into a flat frame with one row per record
+
+    Arguments:
+        ds {xr.Dataset} -- Sparse dataset
+
+    Returns:
+        pd.DataFrame -- Frame with the index columns decoded
+    """
+    index = ds.attrs["index"].split(",")
+    df = pd.DataFrame(
+        {
+            column: ds.coords[column].values[ds[f"{column}_code"].values]
+            for column in index
+        }
+    )
+    for name in ds.data_vars:
+        if not name.endswith("_code"):
+            df[name] = ds[name].values
+    return df
+
+
+def to_dense(ds: xr.Dataset) -> xr.Dataset:
+    """Expand a sparse dataset into the dense cube layout
+    This gives the same structure as calling to_xarray() on the indexed frame
+
+    Arguments:
+        ds {xr.Dataset} -- Sparse dataset
+
+    Returns:
+        xr.Dataset -- Dense dataset with one cell per index combination
+    """
+    index = ds.attrs["index"].split(",")
+    coords = {column: ds.coords[column].values for column in index}
+    shape = tuple(len(values) for values in coords.values())
+    position = tuple(ds[f"{column}_code"].values for column in index)
+
+    data_vars = {}
+    for name in ds.data_vars:
+        if name.endswith("_code"):
+            continue
+
+        # Missing cells are NaN, so integers need to be promoted like pandas does
+        values = ds[name].values
+        dtype = values.dtype
+        if dtype.kind in "iub":
+            dtype = np.float64
+        elif dtype.kind not in "fc":
+            dtype = object
+
+        cube = np.full(shape, np.nan, dtype=dtype)
+        cube[position] = values
+        data_vars[name] = (index, cube, ds[name].attrs)
+
+        # Integer coded labels still need their lookup table
+        lookup = ds[name].attrs.get("categories")
+        if lookup and lookup in ds:
+            coords[lookup] = ds[lookup].values
+
+    return xr.Dataset(data_vars, coords=coords)
+
+
+def select_sparse(ds: xr.Dataset, dim: str, labels: list) -> xr.Dataset:
+    """Keep only the records for some labels of an index column in a sparse dataset
+    This matches selecting the labels from the dense cube, without ever expanding it
+
+    Arguments:
+        ds {xr.Dataset} -- Sparse dataset
+        dim {str} -- Index column to select on, eg. AustralianPort
+        labels {list} -- Labels to keep, in the order they should appear
+
+    Raises:
+        KeyError: If any of the labels can't be found
+
+    Returns:
+        xr.Dataset -- Sparse dataset with only the matching records
+    """
+    positions = pd.Index(ds.coords[dim].values).get_indexer(list(labels))
+    if (positions < 0).any():
+        missing = [label for label, i in zip(labels, positions) if i < 0]
+        raise KeyError(f"{missing} not found in {dim}")
+
+    # Map each old code to its position in the new coordinate, or -1 if it isn't kept
+    remap = np.full(len(ds.coords[dim]), -1, dtype=np.int32)
+    remap[positions] = np.arange(len(positions), dtype=np.int32)
+    codes = remap[ds[f"{dim}_code"].values]
+    keep = np.flatnonzero(codes >= 0)
+
+    ds = ds.isel(record=keep).assign_coords({dim: np.asarray(labels)})
+    return ds.assign({f"{dim}_code": ("record", codes[keep])})
+
+
+def rollup_name(variable: str, dim: str, freq: str = "monthly") -> str:
+    """Get the name of a rollup variable
+
+    Arguments:
+        variable {str} -- Count variable that was summed, eg. PaxIn
+        dim {str} -- Dimension the totals are kept for, eg. AustralianPort
+
+    Keyword Arguments:
+        freq {str} -- Either "monthly" or "yearly" (default: {"monthly"})
+
+    Returns:
+        str -- Rollup variable name, eg. PaxIn_by_AustralianPort_monthly
+    """
+    return f"{variable}_by_{dim}_{freq}"
+
+
+def compute_rollups(ds: xr.Dataset) -> xr.Dataset:
+    """Pre-compute the totals that most charts need
+    For every count variable and every port dimension, this sums over the other port dimension
+    Totals are kept for each month, and for each calendar year in a 'Year' dimension
+
+    Arguments:
+        ds {xr.Dataset} -- Dense or sparse dataset
+
+    Returns:
+        xr.Dataset -- Dataset of rollup variables
+    """
+    if is_sparse(ds):
+        index = ds.attrs["index"].split(",")
+        df = sparse_to_frame(ds)
+    else:
+        index = [dim for dim in ds.dims if dim in ds.coords]
+
+    rollups = {}
+    for variable in COUNT_COLUMNS:
+        if variable not in ds.data_vars:
+            continue
+
+        for dim in index:
+            if dim == "Month":
+                continue
+
+            if is_sparse(ds):
+                monthly = (
+                    df.groupby([dim, "Month"])[variable]
+                    .sum()
+                    .to_xarray()
+                    .reindex({dim: ds.coords[dim], "Month": ds.coords["Month"]})
+                    .fillna(0)
+                    .astype(np.float64)
+                )
+            else:
+                others = [other for other in index if other not in (dim, "Month")]
+                monthly = ds[variable].sum(others).transpose(dim, "Month")
+
+            yearly = monthly.groupby("Month.year").sum().rename(year="Year")
+            rollups[rollup_name(variable, dim, "monthly")] = monthly
+            rollups[rollup_name(variable, dim, "yearly")] = yearly
+
+    return xr.Dataset(rollups)
+
+
+def cdf_format(path: str) -> str:
+    """Work out the format of a saved dataset
+    Zarr stores are directories, while netCDF files are single files
+
+    Arguments:
+        path {str} -- Saved dataset
+
+    Returns:
+        str -- Either "zarr" or "netcdf"
+    """
+    if os.path.isdir(path):
+        return "zarr"
+    return "netcdf"
+
+
+def open_cdf(path: str, **kwargs) -> xr.Dataset:
+    """Open a saved dataset in either format, without any post-processing
+
+    Arguments:
+        path {str} -- Saved dataset
+
+    Returns:
+        xr.Dataset -- Dataset as stored
+    """
+    if cdf_format(path) == "zarr":
+        return xr.open_dataset(path, engine="zarr", consolidated=True, **kwargs)
+    return xr.open_dataset(path, **kwargs)
+
+
+def load_rollups(input: str) -> xr.Dataset:
+    """Load the pre-computed totals saved alongside a cdf file
+
+    Arguments:
+        input {str} -- Filename to load
+
+    Returns:
+        xr.Dataset -- Dataset of rollup variables
+    """
+    return open_cdf(input, group=ROLLUP_GROUP)
+
+
+def output_encoding(
+    ds: xr.Dataset,
+    chunks: dict = None,
+    compression: str = None,
+    complevel: int = 4,
+    compact: bool = False,
+    format: str = "netcdf",
+) -> dict:
+    """Build the output encoding for every data variable in a dataset
+    Chunk sizes of -1 (or dimensions not listed) cover the full length of that dimension
+
+    Arguments:
+        ds {xr.Dataset} -- Dataset that will be written
+
+    Keyword Arguments:
+        chunks {dict} -- Chunk size for each dimension, eg. {"AustralianPort": 1} (default: {None})
+        compression {str} -- Compression filter, either "zlib" or "lzf" (default: {None})
+        complevel {int} -- Compression level for zlib, from 1 to 9 (default: {4})
+        compact {bool} -- Store whole number counts as the smallest integer type that fits (default: {False})
+        format {str} -- Output format, either "netcdf" or "zarr" (default: {"netcdf"})
+
+    Returns:
+        dict -- Encoding suitable for to_netcdf or to_zarr
+    """
+    if compression not in (None, "zlib", "lzf"):
+        raise ValueError(f"Unknown compression filter: {compression}")
+
+    encoding = {}
+    for name, variable in ds.data_vars.items():
+        settings = {}
+        if chunks:
+            sizes = tuple(
+                (
+                    length
+                    if chunks.get(dim, -1) in (-1, None)
+                    else min(chunks[dim], length)
+                )
+                for dim, length in zip(variable.dims, variable.shape)
+            )
+            settings["chunks" if format == "zarr" else "chunksizes"] = sizes
+
+        if format == "zarr":
+            # Zarr has no lzf filter, so use lz4 as the fast option instead
+            codec = None
+            if compression == "zlib":
+                codec = numcodecs.Zlib(level=complevel)
+            elif compression == "lzf":
+                codec = numcodecs.LZ4()
+
+            if codec:
+                if int(zarr.__version__.split(".")[0]) >= 3:
+                    settings["compressors"] = (codec,)
+                else:
+                    settings["compressor"] = codec
+        elif compression == "zlib":
+            settings["zlib"] = True
+            settings["complevel"] = complevel
+            settings["shuffle"] = True
+        elif compression == "lzf":
+            settings["compression"] = "lzf"
+            settings["shuffle"] = True
+
+        # Dense cubes hold counts as floats because of the missing cells
+        # These can be stored as integers, with -1 marking the missing cells
+        if compact and name in COUNT_COLUMNS and variable.dtype.kind == "f":
+            values = variable.values[~np.isnan(variable.values)]
+            if values.size and values.min() >= 0 and np.all(values == np.floor(values)):
+                for dtype in (np.int8, np.int16, np.int32, np.int64):
+                    if values.max() <= np.iinfo(dtype).max:
+                        settings["dtype"] = np.dtype(dtype).name
+                        settings["_FillValue"] = -1
+                        break
+
+        if settings:
+            encoding[name] = settings
+
+    return encoding
+
+
+def storage_settings(path: str) -> dict:
+    """Work out the chunking, compression and compact dtypes a dataset was saved with
+    These can be passed to output_encoding, so a rewritten dataset is stored the same way
+
+    Arguments:
+        path {str} -- Saved dataset
+
+    Returns:
+        dict -- chunks, compression, complevel and compact settings
+    """
+    settings = {"chunks": None, "compression": None, "complevel": 4, "compact": False}
+    with open_cdf(path) as ds:
+        for name, variable in ds.data_vars.items():
+            encoding = variable.encoding
+
+            # Compact files store labels as codes, and counts as integers with -1 for missing cells
+            if variable.attrs.get("categories"):
+                settings["compact"] = True
+            elif name in COUNT_COLUMNS and "_FillValue" in encoding:
+                settings["compact"] |= (
+                    np.dtype(encoding.get("dtype", "f8")).kind in "iu"
+                )
+
+            sizes = encoding.get("chunksizes") or encoding.get("chunks")
+            if sizes and settings["chunks"] is None:
+                settings["chunks"] = {
+                    dim: size
+                    for dim, size, length in zip(variable.dims, sizes, variable.shape)
+                    if size < length
+                }
+
+            codecs = encoding.get("compressors") or [encoding.get("compressor")]
+            codec = codecs[0] if codecs else None
+            if encoding.get("zlib"):
+                settings["compression"] = "zlib"
+                settings["complevel"] = encoding.get("complevel", 4)
+            elif encoding.get("compression") == "lzf":
+                settings["compression"] = "lzf"
+            elif codec is not None and getattr(codec, "codec_id", None) == "zlib":
+                settings["compression"] = "zlib"
+                settings["complevel"] = codec.level
+            elif codec is not None and getattr(codec, "codec_id", None) == "lz4":
+                settings["compression"] = "lzf"
+
+    return settings
+
+
+def save_cdf(ds: xr.Dataset, path: str, format: str, encoding: dict, group: str = None):
+    """Save a dataset in either format
+    Saving to a group adds it to the existing file
+
+    Arguments:
+        ds {xr.Dataset} -- Dataset to save
+        path {str} -- Output file, or directory for zarr stores
+        format {str} -- Either "netcdf" or "zarr"
+        encoding {dict} -- Encoding from output_encoding
+
+    Keyword Arguments:
+        group {str} -- Group to save the dataset in (default: {None})
+    """
+    # Anything loaded from an earlier file still carries its old encoding, so start fresh
+    ds = ds.drop_encoding()
+    mode = "a" if group else "w"
+    if format == "zarr":
+        # Fixed width strings don't round trip through every zarr release, so store them as text
+        ds = ds.assign_coords(
+            {
+                name: ds[name].astype(object)
+                for name in ds.coords
+                if ds[name].dtype.kind == "U"
+            }
+        ).assign(
+            {
+                name: ds[name].astype(object)
+                for name in ds.data_vars
+                if ds[name].dtype.kind == "U"
+            }
+        )
+        ds.to_zarr(
+            path,
+            mode=mode,
+            group=group,
+            encoding=encoding,
+            zarr_format=ZARR_FORMAT,
+            consolidated=False,
+        )
+    else:
+        ds.to_netcdf(path, mode=mode, group=group, engine="h5netcdf", encoding=encoding)
+
+
+def remove_cdf(path: str):
+    """Remove a saved dataset in either format, if it exists
+
+    Arguments:
+        path {str} -- Saved dataset
+    """
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def cdf_size(path: str) -> int:
+    """Get the size of a saved dataset in either format
+
+    Arguments:
+        path {str} -- Saved dataset
+
+    Returns:
+        int -- Size in bytes
+    """
+    if not os.path.isdir(path):
+        return os.path.getsize(path)
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(path)
+        for name in names
+    )
+
 
 def excel_to_cdf(
     files: list = None,
@@ -31,6 +1073,21 @@ def excel_to_cdf(
     output: str = None,
     mergedate: bool = False,
     verbose: bool = False,
+    jobs: int = 1,
+    cache_dir: str = DEFAULT_CACHE_DIR,
+    append: bool = False,
+    sparse: bool = False,
+    chunks: dict = None,
+    compression: str = None,
+    complevel: int = 4,
+    compact: bool = False,
+    stream: bool = False,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    rollups: bool = False,
+    profile: str = None,
+    quarantine: str = None,
+    pool: Executor = None,
+    format: str = None,
 ) -> xr.Dataset:
     """Process a list of excel spreadsheets into an xarray format and save as a cdf
     This only includes specific columns in the resulting spreadsheet
@@ -40,6 +1097,21 @@ def excel_to_cdf(
         columns {list} -- List of columns to include in the resulting structure (default: columns for international city pairs)
         index {list} -- Ordered list of columns to index the data with (default: index for international city pairs)
         output {str} -- If specified, save the resulting structure to the file (default: {None})
+        jobs {int} -- Number of worker processes used to parse the spreadsheets (default: {1})
+        cache_dir {str} -- Directory to cache parsed spreadsheets in. None disables caching (default: {DEFAULT_CACHE_DIR})
+        append {bool} -- Extend the existing output file with months newer than its last Month (default: {False})
+        sparse {bool} -- Store only observed rows in a coordinate-list layout instead of a dense cube (default: {False})
+        chunks {dict} -- Chunk size for each dimension in the output file, -1 for the full axis (default: {None})
+        compression {str} -- Compression filter for the output file, either "zlib" or "lzf" (default: {None})
+        complevel {int} -- Compression level when using zlib (default: {4})
+        compact {bool} -- Use compact dtypes while parsing, and store labels as integer codes (default: {False})
+        stream {bool} -- Read .xlsx spreadsheets in batches of rows to bound memory (default: {False})
+        batch_size {int} -- Number of rows per batch when streaming (default: {DEFAULT_BATCH_SIZE})
+        rollups {bool} -- Save monthly and yearly port totals in a separate group of the output (default: {False})
+        profile {str} -- If specified, save a JSON report of the time, rows and memory of each stage (default: {None})
+        quarantine {str} -- If specified, save rows rejected during validation to this CSV file (default: {None})
+        pool {Executor} -- Existing worker pool to parse the spreadsheets with, used instead of jobs (default: {None})
+        format {str} -- Output format, either "netcdf" or "zarr". Defaults to zarr for .zarr outputs (default: {None})
 
     Returns:
         xr.Dataset -- Concatenated spreadsheets in xarray Dataset form
@@ -48,60 +1120,274 @@ def excel_to_cdf(
     files = files if files else DEFAULT_FILENAMES
     columns = columns if columns else DEFAULT_COLUMNS
     index = index if index else DEFAULT_INDEX
+    if not format:
+        format = "zarr" if output and output.endswith(".zarr") else "netcdf"
+    if format not in ("netcdf", "zarr"):
+        raise ValueError(f"Unknown output format: {format}")
+    if format == "zarr" and not zarr:
+        raise ImportError("zarr is required to save in the zarr format")
+    stages = [] if profile else None
+    validation = {}
+    rejected = []
+    start = time.perf_counter()
+    tracing = track_memory() if profile else False
+
+    # Caching relies on pyarrow for the Feather format
+    if cache_dir and not pyarrow:
+        if verbose:
+            print("pyarrow is not installed, spreadsheet caching is disabled")
+        cache_dir = None
+
+    # When appending, only rows after the last month already in the output are kept
+    existing = None
+    if append:
+        if not output:
+            raise ValueError("An output file is required when appending")
+        if os.path.exists(output):
+            with open_cdf(output) as ds:
+                existing = decode_categories(ds.load())
+            last_month = existing.coords["Month"].values.max()
+
+            if verbose:
+                print(f"Appending to {output} after {pd.Timestamp(last_month):%m-%Y}")
+
+    # Work out which spreadsheets can skip parsing before any workers start
+    cached = [
+        bool(cache_dir)
+        and is_cached(cache_path(file, columns, sheet, mergedate, cache_dir, compact))
+        for file in files
+    ]
 
     # The data we need is split across multiple spreadsheets, concat all of these together
     # Most columns aren't important - so only take the ones we need
     # This step also has some basic data sanitisation to help keep the data stable
-    data = []
-    for file in files:
-        df = pd.read_excel(file, sheet_name=sheet)
-        # Date combining if required
-        if mergedate:
-            df["Month"] = pd.to_datetime(df[["Year", "Month"]].assign(DAY=1))
+    loader = functools.partial(
+        load_excel_report,
+        profile=bool(profile),
+        columns=columns,
+        sheet=sheet,
+        mergedate=mergedate,
+        cache_dir=cache_dir,
+        compact=compact,
+        stream=stream,
+        batch_size=batch_size,
+    )
+    if pool is not None:
+        # Submit everything up front so a shared pool can work on several datasets at once
+        futures = [pool.submit(loader, file) for file in files]
+        frames = (future.result() for future in futures)
+    elif jobs > 1 and len(files) > 1:
+        # Parsing is CPU bound, so spread the spreadsheets across processes
+        # map() hands the results back in the original file order
+        with ProcessPoolExecutor(max_workers=min(jobs, len(files))) as executor:
+            frames = executor.map(loader, files)
+    else:
+        frames = map(loader, files)
 
-        # Strip columns as needed
-        df = df[columns]
+    data = []
+    for file, (df, records, checks), hit in zip(files, frames, cached):
+        if profile:
+            stages.extend(records)
+        validation[file] = checks["counts"]
+        rejected.extend(checks["rejected"])
 
-        # Basic sanitising
-        df = df.replace("..", 0)
-        if "Passengers" in df.columns:
-            df = df[
-                ~df.Passengers.str.contains("Data not available for release.", na=False)
-            ]
+        if existing is not None:
+            with profile_stage(
+                stages, "append_filter", len(df.index), file=file
+            ) as record:
+                df = df[df["Month"] > last_month]
+                record["rows_out"] = len(df.index)
 
         # Add to the list of parsed spreadsheets
         data.append(df)
 
         # Logging
         if verbose:
-            print(f"Loaded {file}")
+            print(f"Loaded {file}" + (" (cached)" if hit else ""))
             print(f"Row Count: {len(df.index)}")
+            print(
+                "Placeholders: {placeholder}, Suppressed: {suppressed}, Invalid: {invalid}".format(
+                    **checks["counts"]
+                )
+            )
+
+    # Keep track of everything that was dropped, so suppressed data can be reviewed
+    if quarantine:
+        columns_out = list(columns) + ["reason", "file"]
+        if rejected:
+            quarantined = pd.concat(rejected, ignore_index=True)
+        else:
+            quarantined = pd.DataFrame(columns=columns_out)
+        quarantined.to_csv(quarantine, index=False, columns=columns_out)
+
+        if verbose:
+            print(f"Saved {len(quarantined.index)} rejected rows to {quarantine}")
 
     # Combine & reshape the data so it's easier to work with
-    combined = pd.concat(data)
-    combined = combined.set_index(index)
-    combined = combined.to_xarray()
+    rows = sum(len(df.index) for df in data)
+    if compact:
+        with profile_stage(stages, "unify_categories", rows):
+            data = unify_categories(data)
+    with profile_stage(stages, "concat", rows):
+        combined = pd.concat(data)
+    if existing is not None and len(combined.index) == 0:
+        if verbose:
+            print(f"No new months found, {output} is already up to date")
+        return existing
+
+    if sparse:
+        # Sparse files keep one record per row, so appending is just adding rows
+        if existing is not None:
+            if is_sparse(existing):
+                previous = sparse_to_frame(existing)
+            else:
+                previous = existing.to_dataframe().dropna(how="all").reset_index()
+            combined = pd.concat([previous, combined], ignore_index=True)
+        with profile_stage(stages, "to_sparse", len(combined.index)):
+            combined = to_sparse(combined, index)
+    else:
+        with profile_stage(stages, "set_index", rows):
+            combined = combined.set_index(index)
+        with profile_stage(stages, "to_xarray", rows) as record:
+            combined = combined.to_xarray()
+            record["cells"] = int(np.prod(list(combined.sizes.values())))
+
+        # Categorical coordinates can't be saved, so turn them back into plain labels
+        combined = combined.assign_coords(
+            {column: np.asarray(combined.indexes[column]) for column in index}
+        )
+
+        if existing is not None:
+            if is_sparse(existing):
+                existing = to_dense(existing)
+
+            # Extend along the Month axis, new ports are filled in with blanks
+            with profile_stage(stages, "append_concat", rows):
+                combined = xr.concat([existing, combined], dim="Month", join="outer")
 
     # If an output filename is given, save the file
     if output:
-        combined.to_netcdf(output, engine="h5netcdf")
+        # Write alongside the output first so a failed write never corrupts an existing cube
+        temp_output = f"{output}.tmp"
+        remove_cdf(temp_output)
+        with profile_stage(stages, "write", rows) as record:
+            saved = encode_categories(combined) if compact else combined
+            encoding = output_encoding(
+                saved, chunks, compression, complevel, compact, format
+            )
+            save_cdf(saved, temp_output, format, encoding)
+            record["bytes"] = cdf_size(temp_output)
+
+        # Rollups are always recomputed from the full data, so appending keeps them in sync
+        if rollups:
+            with profile_stage(stages, "rollups", rows):
+                totals = compute_rollups(combined)
+                encoding = output_encoding(
+                    totals, compression=compression, complevel=complevel, format=format
+                )
+                save_cdf(totals, temp_output, format, encoding, group=ROLLUP_GROUP)
+
+        # Zarr metadata is consolidated once every group is written
+        if format == "zarr":
+            zarr.consolidate_metadata(temp_output)
+
+        remove_cdf(output)
+        os.replace(temp_output, output)
 
         if verbose:
             print(f"Successfully saved to {output}")
 
+    if profile:
+        report = {
+            "files": list(files),
+            "jobs": jobs,
+            "rows": rows,
+            "seconds": time.perf_counter() - start,
+            "peak_rss": peak_rss(),
+            "validation": validation,
+            "stages": stages,
+        }
+        with open(profile, "w") as f:
+            json.dump(report, f, indent=2)
+
+        if verbose:
+            print(f"Saved profile to {profile}")
+
+    if tracing:
+        tracemalloc.stop()
+
     return combined
 
 
-def load_cdf(input: str) -> xr.Dataset:
+def load_cdf(
+    input: str,
+    dense: bool = True,
+    chunks: dict = None,
+    variables: list = None,
+    ports: list = None,
+) -> xr.Dataset:
     """Load a cdf file into an xarray dataset
+    Both netCDF files and zarr stores are supported, and the format is detected automatically
+    Files saved in the sparse layout are expanded into the dense cube unless requested otherwise
+    Passing chunks gives a lazily evaluated dask-backed dataset, so reductions run in parallel
 
     Arguments:
         input {str} -- Filename to load
 
+    Keyword Arguments:
+        dense {bool} -- Expand sparse files into the dense cube layout (default: {True})
+        chunks {dict} -- Dask chunk sizes for each dimension, or "auto" (default: {None})
+        variables {list} -- Only include these data variables (default: {None})
+        ports {list} -- Only include these ports along the first port dimension, AustralianPort or Origin (default: {None})
+
     Returns:
         xr.Dataset -- Resulting dataset
     """
-    return xr.open_dataset(input)
+    ds = open_cdf(input, chunks=chunks)
+    if variables:
+        ds = ds.drop_vars(
+            [
+                name
+                for name in ds.data_vars
+                if ds[name].attrs.get("categories") and name not in variables
+            ]
+        )
+    sparse = is_sparse(ds)
+    if sparse:
+        if not dense:
+            return decode_categories(ds)
+
+        # Codes are needed to expand the data, so only trim the value variables here
+        if variables:
+            ds = ds.drop_vars(
+                [
+                    name
+                    for name in ds.data_vars
+                    if not name.endswith("_code") and name not in variables
+                ]
+            )
+
+        # Filter the records before expanding, so the cube only covers the requested ports
+        if ports:
+            for dim in PORT_DIMS:
+                if dim in ds.coords:
+                    ds = select_sparse(ds, dim, ports)
+                    break
+        ds = to_dense(ds)
+        if chunks:
+            ds = ds.chunk(chunks)
+    elif ports:
+        for dim in PORT_DIMS:
+            if dim in ds.dims:
+                ds = ds.sel({dim: list(ports)})
+                break
+
+    # Decode after selecting, so only the requested ports are ever read
+    ds = decode_categories(ds)
+    if variables and not sparse:
+        ds = ds[list(variables)]
+
+    return ds
 
 
 if __name__ == "__main__":
@@ -129,8 +1415,103 @@ if __name__ == "__main__":
         "--verbose", action="store_true", help="Enable additional output logging"
     )
     parser.add_argument("--output", help="Output cdf file. Leave blank for no saving.")
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of worker processes used to parse spreadsheets. Defaults to 1",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=DEFAULT_CACHE_DIR,
+        help=f"Directory to cache parsed spreadsheets in. Defaults to '{DEFAULT_CACHE_DIR}'",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always parse the spreadsheets, ignoring and not updating the cache",
+    )
+    parser.add_argument(
+        "--clear-cache",
+        action="store_true",
+        help="Remove all cached spreadsheets before processing",
+    )
+    parser.add_argument(
+        "--append",
+        action="store_true",
+        help="Only add months newer than those already in the output file",
+    )
+    parser.add_argument(
+        "--sparse",
+        action="store_true",
+        help="Only store observed rows instead of a dense cube of every combination",
+    )
+    parser.add_argument(
+        "--chunks",
+        nargs="*",
+        metavar="DIM=SIZE",
+        help="Chunk size for each dimension in the output file, eg. AustralianPort=1 Month=-1",
+    )
+    parser.add_argument(
+        "--compression",
+        choices=["zlib", "lzf"],
+        help="Compression filter for the output file. Leave blank for no compression.",
+    )
+    parser.add_argument(
+        "--complevel",
+        type=int,
+        default=4,
+        help="Compression level when using zlib. Defaults to 4",
+    )
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="Use compact dtypes, and store labels as integer codes with a lookup table",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Read .xlsx spreadsheets in batches of rows to reduce peak memory",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help=f"Number of rows per batch when streaming. Defaults to {DEFAULT_BATCH_SIZE}",
+    )
+    parser.add_argument(
+        "--rollups",
+        action="store_true",
+        help="Save monthly and yearly port totals alongside the data",
+    )
+    parser.add_argument(
+        "--profile",
+        help="Save a JSON report of the time, rows and memory used by each stage",
+    )
+    parser.add_argument(
+        "--quarantine",
+        help="Save rows rejected during validation to a CSV file",
+    )
+    parser.add_argument(
+        "--format",
+        choices=["netcdf", "zarr"],
+        help="Output format. Defaults to zarr for .zarr outputs, otherwise netcdf",
+    )
     args = parser.parse_args()
 
+    if args.clear_cache:
+        removed = clear_cache(args.cache_dir)
+        if args.verbose:
+            print(f"Removed {removed} cached spreadsheets from {args.cache_dir}")
+
+    # Chunks are given as DIM=SIZE pairs
+    chunks = None
+    if args.chunks:
+        chunks = {}
+        for pair in args.chunks:
+            dim, _, size = pair.partition("=")
+            chunks[dim] = int(size)
+
     excel_to_cdf(
         files=args.files,
         sheet=args.sheet,
@@ -139,4 +1520,18 @@ if __name__ == "__main__":
         output=args.output,
         mergedate=args.mergedate,
         verbose=args.verbose,
+        jobs=args.jobs,
+        cache_dir=None if args.no_cache else args.cache_dir,
+        append=args.append,
+        sparse=args.sparse,
+        chunks=chunks,
+        compression=args.compression,
+        complevel=args.complevel,
+        compact=args.compact,
+        stream=args.stream,
+        batch_size=args.batch_size,
+        rollups=args.rollups,
+        profile=args.profile,
+        quarantine=args.quarantine,
+        format=args.format,
     )